@@ -0,0 +1,407 @@
+import asyncio
+import itertools
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import httplib2
+from google.api_core.exceptions import NotFound
+from googleapiclient.errors import HttpError
+
+real_sleep = time.sleep
+real_async_sleep = asyncio.sleep
+
+UNLOCKED_METHODS = {"zoneOperations.wait", "globalOperations.wait"}
+
+DEFAULT_LATENCIES = {
+    "api_call": 0.4,
+    "instance_start": 21.4,
+    "instance_stop": 5.9,
+    "instance_insert": 30,
+    "instance_insert_from_image": 45,
+    "instance_delete": 20,
+    "disk_from_snapshot": 45,
+    "disk_delete": 10,
+    "snapshot": 60,
+    "service_boot": 40,
+}
+
+
+class FakeRequest:
+    def __init__(self, engine, method, function):
+        self.engine = engine
+        self.method = method
+        self.function = function
+
+    def execute(self):
+        return self.engine.call(self.method, self.function)
+
+
+class FakeCollection:
+    def __init__(self, engine, name, methods: dict):
+        self.engine = engine
+        self.name = name
+        self.methods = methods
+
+    def __getattr__(self, method):
+        if method.endswith("_next"):
+            return lambda **kwargs: None
+        function = self.methods[method]
+        return lambda **kwargs: FakeRequest(self.engine, f"{self.name}.{method}", lambda: function(**kwargs))
+
+
+class FakeCompute:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def instances(self):
+        engine = self.engine
+        methods = {
+            "insert": engine.insert_instance,
+            "get": engine.get_instance_dict,
+            "delete": engine.delete_instance,
+            "setMetadata": engine.set_metadata,
+            "getGuestAttributes": engine.get_guest_attributes,
+        }
+        return FakeCollection(engine, "instances", methods)
+
+    def disks(self):
+        engine = self.engine
+        methods = {
+            "insert": engine.insert_disk,
+            "get": engine.get_disk,
+            "list": engine.list_disks,
+            "setLabels": engine.set_disk_labels,
+            "createSnapshot": engine.create_snapshot,
+        }
+        return FakeCollection(engine, "disks", methods)
+
+    def snapshots(self):
+        return FakeCollection(self.engine, "snapshots", {"get": self.engine.get_snapshot})
+
+    def zones(self):
+        return FakeCollection(self.engine, "zones", {"list": self.engine.list_zones})
+
+    def acceleratorTypes(self):
+        methods = {
+            "list": lambda project, zone: self.engine.list_zone_items(zone, self.engine.accelerator_zones, "nvidia-l4"),
+            "aggregatedList": lambda project, filter: self.engine.aggregated_list(
+                "acceleratorTypes", self.engine.accelerator_zones, "nvidia-l4"
+            ),
+        }
+        return FakeCollection(self.engine, "acceleratorTypes", methods)
+
+    def machineTypes(self):
+        methods = {
+            "list": lambda project, zone: self.engine.list_zone_items(zone, self.engine.machine_type_zones, "g2-standard-4"),
+            "aggregatedList": lambda project, filter: self.engine.aggregated_list(
+                "machineTypes", self.engine.machine_type_zones, "g2-standard-4"
+            ),
+        }
+        return FakeCollection(self.engine, "machineTypes", methods)
+
+    def zoneOperations(self):
+        methods = {
+            "get": self.engine.get_operation,
+            "wait": self.engine.wait_operation,
+            "list": self.engine.list_zone_operations,
+        }
+        return FakeCollection(self.engine, "zoneOperations", methods)
+
+    def globalOperations(self):
+        methods = {"get": self.engine.get_operation, "wait": self.engine.wait_operation}
+        return FakeCollection(self.engine, "globalOperations", methods)
+
+
+class FakeInstancesClient:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def get(self, project, zone, instance):
+        return self.engine.call("instances_client.get", lambda: self.engine.get_instance_object(zone, instance))
+
+    def start(self, project, zone, instance):
+        return self.engine.call("instances_client.start", lambda: self.engine.power(zone, instance, "RUNNING"))
+
+    def stop(self, project, zone, instance):
+        return self.engine.call("instances_client.stop", lambda: self.engine.power(zone, instance, "TERMINATED"))
+
+
+class FakeDisksClient:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def delete(self, project, zone, disk):
+        operation = self.engine.call("disks_client.delete", lambda: self.engine.delete_disk(zone, disk))
+        return SimpleNamespace(result=lambda: self.engine.wait_operation(operation=operation["name"]))
+
+
+class FakeReadinessCheck:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def is_ready(self, ip_address):
+        self.engine.record("service.probe")
+        return self.engine.is_service_ready(ip_address)
+
+
+class FakeComputeEngine:
+    def __init__(self, time_scale=0.01, latencies=None, zones=None, exhausted_zones=()):
+        self.time_scale = time_scale
+        self.latencies = {**DEFAULT_LATENCIES, **(latencies or {})}
+        self.zones = zones or ["europe-west4-a", "europe-west4-b", "europe-west4-c", "us-central1-a"]
+        self.accelerator_zones = set(self.zones)
+        self.machine_type_zones = set(self.zones)
+        self.exhausted_zones = set(exhausted_zones)
+        self.lock = threading.RLock()
+        self.calls = Counter()
+        self.instances = {}
+        self.disks = {}
+        self.snapshots = {"translation-server-snapshot"}
+        self.operations = {}
+        self.system_events = []
+        self.ids = itertools.count(1)
+        self.compute = FakeCompute(self)
+        self.instances_client = FakeInstancesClient(self)
+        self.disks_client = FakeDisksClient(self)
+        self.readiness_check = FakeReadinessCheck(self)
+
+    def sleep(self, seconds):
+        real_sleep(seconds * self.time_scale)
+
+    async def async_sleep(self, seconds, result=None):
+        return await real_async_sleep(seconds * self.time_scale, result)
+
+    def delay(self, latency_name):
+        return self.latencies[latency_name] * self.time_scale
+
+    def record(self, method):
+        with self.lock:
+            self.calls[method] += 1
+
+    def call(self, method, function):
+        self.record(method)
+        self.sleep(self.latencies["api_call"])
+        if method in UNLOCKED_METHODS:
+            return function()
+        with self.lock:
+            return function()
+
+    def api_call_count(self):
+        return sum(count for method, count in self.calls.items() if method != "service.probe")
+
+    @staticmethod
+    def not_found_http_error():
+        return HttpError(httplib2.Response({"status": 404}), b"Not found")
+
+    def create_operation(self, zone, latency_name, on_done=None, error_code=None):
+        name = f"operation-{next(self.ids)}"
+        self.operations[name] = {
+            "done_at": time.monotonic() + self.delay(latency_name),
+            "zone": zone,
+            "on_done": on_done,
+            "error_code": error_code,
+            "finished": False,
+        }
+        operation = {"name": name, "status": "RUNNING"}
+        if zone:
+            operation["zone"] = f"projects/fake/zones/{zone}"
+        return operation
+
+    def get_operation(self, operation, project=None, zone=None):
+        state = self.operations[operation]
+        if time.monotonic() < state["done_at"]:
+            return {"name": operation, "status": "RUNNING"}
+
+        if not state["finished"]:
+            state["finished"] = True
+            if state["on_done"] and not state["error_code"]:
+                state["on_done"]()
+
+        if state["error_code"]:
+            return {"name": operation, "status": "DONE", "error": {"errors": [{"code": state["error_code"]}]}}
+        return {"name": operation, "status": "DONE"}
+
+    def wait_operation(self, operation, project=None, zone=None):
+        with self.lock:
+            remaining = self.operations[operation]["done_at"] - time.monotonic()
+        real_sleep(max(remaining, 0))
+        with self.lock:
+            return self.get_operation(operation)
+
+    def add_instance(self, zone, name, status="RUNNING", service_ready=True):
+        with self.lock:
+            self.instances[(zone, name)] = {
+                "id": str(next(self.ids)),
+                "name": name,
+                "zone": zone,
+                "status": status,
+                "transition": None,
+                "ip": f"10.0.0.{len(self.instances) + 1}",
+                "running_since": time.monotonic() - (self.delay("service_boot") if service_ready else 0),
+                "metadata": {"fingerprint": "0", "items": []},
+            }
+
+    def get_instance_key(self, zone, name_or_id):
+        if (zone, name_or_id) in self.instances:
+            return zone, name_or_id
+        for key, instance in self.instances.items():
+            if key[0] == zone and instance["id"] == str(name_or_id):
+                return key
+        return None
+
+    def get_instance_state(self, zone, name):
+        instance = self.instances.get(self.get_instance_key(zone, name))
+        if not instance:
+            return None
+
+        if instance["transition"] and time.monotonic() >= instance["transition"][1]:
+            instance["status"] = instance["transition"][0]
+            instance["transition"] = None
+            if instance["status"] == "RUNNING":
+                instance["running_since"] = time.monotonic()
+        return instance
+
+    def get_instance_object(self, zone, name):
+        instance = self.get_instance_state(zone, name)
+        if not instance:
+            raise NotFound(f"Instance {name} not found")
+        access_config = SimpleNamespace(nat_i_p=instance["ip"] if instance["status"] == "RUNNING" else "")
+        return SimpleNamespace(
+            status=instance["status"],
+            network_interfaces=[SimpleNamespace(access_configs=[access_config])],
+            guest_accelerators=[SimpleNamespace(accelerator_type="nvidia-l4", accelerator_count=1)],
+        )
+
+    def get_instance_dict(self, project, zone, instance):
+        state = self.get_instance_state(zone, instance)
+        if not state:
+            raise self.not_found_http_error()
+        return {
+            "id": state["id"],
+            "name": state["name"],
+            "status": state["status"],
+            "disks": [{"boot": True, "source": f"projects/fake/zones/{zone}/disks/{state['name']}-disk"}],
+            "metadata": state["metadata"],
+        }
+
+    def get_guest_attributes(self, project, zone, instance, queryPath):
+        if not self.get_instance_state(zone, instance):
+            raise self.not_found_http_error()
+        boot_milliseconds = str(int(self.latencies["service_boot"] * 1000))
+        items = [{"namespace": queryPath.strip("/"), "key": "total", "value": boot_milliseconds}]
+        return {"queryPath": queryPath, "queryValue": {"items": items}}
+
+    def set_metadata(self, project, zone, instance, body):
+        state = self.get_instance_state(zone, instance)
+        if not state:
+            raise self.not_found_http_error()
+        if body["fingerprint"] != state["metadata"]["fingerprint"]:
+            raise HttpError(httplib2.Response({"status": 412}), b"Fingerprint mismatch")
+        state["metadata"] = {"fingerprint": str(int(state["metadata"]["fingerprint"]) + 1), "items": body["items"]}
+        return self.create_operation(zone, "api_call")
+
+    def power(self, zone, name, target_status):
+        instance = self.get_instance_state(zone, name)
+        if not instance:
+            raise NotFound(f"Instance {name} not found")
+        if instance["status"] == target_status or (instance["transition"] and instance["transition"][0] == target_status):
+            return
+        latency_name = "instance_start" if target_status == "RUNNING" else "instance_stop"
+        instance["status"] = "STAGING" if target_status == "RUNNING" else "STOPPING"
+        instance["transition"] = (target_status, time.monotonic() + self.delay(latency_name))
+
+    def preempt(self, zone, name):
+        with self.lock:
+            instance = self.instances[self.get_instance_key(zone, name)]
+            instance["status"] = "TERMINATED"
+            instance["transition"] = None
+            self.system_events.append(
+                {
+                    "operationType": "compute.instances.preempted",
+                    "zone": zone,
+                    "targetId": instance["id"],
+                    "targetLink": f"projects/fake/zones/{zone}/instances/{instance['name']}",
+                    "insertTime": datetime.now(timezone.utc).isoformat(),
+                }
+            )
+
+    def list_zone_operations(self, project, zone, filter=None):
+        return {"items": [event for event in self.system_events if event["zone"] == zone]}
+
+    def is_service_ready(self, ip_address):
+        with self.lock:
+            for zone, name in list(self.instances):
+                instance = self.get_instance_state(zone, name)
+                if instance["ip"] == ip_address and instance["status"] == "RUNNING":
+                    return time.monotonic() - instance["running_since"] >= self.delay("service_boot")
+        return False
+
+    def insert_instance(self, project, zone, body):
+        if zone in self.exhausted_zones:
+            return self.create_operation(zone, "api_call", error_code="ZONE_RESOURCE_POOL_EXHAUSTED_WITH_DETAILS")
+
+        def create():
+            self.add_instance(zone, body["name"], service_ready=False)
+
+        from_image = "sourceMachineImage" in body or any("initializeParams" in disk for disk in body.get("disks", []))
+        return self.create_operation(zone, "instance_insert_from_image" if from_image else "instance_insert", on_done=create)
+
+    def delete_instance(self, project, zone, instance):
+        key = self.get_instance_key(zone, instance)
+        if not key:
+            raise self.not_found_http_error()
+        return self.create_operation(zone, "instance_delete", on_done=lambda: self.instances.pop(key, None))
+
+    def insert_disk(self, project, zone, body):
+        def create():
+            self.disks[(zone, body["name"])] = {**body, "status": "READY", "labelFingerprint": str(next(self.ids))}
+
+        return self.create_operation(zone, "disk_from_snapshot", on_done=create)
+
+    def get_disk(self, project, zone, disk):
+        if (zone, disk) not in self.disks:
+            raise self.not_found_http_error()
+        return self.disks[(zone, disk)]
+
+    def list_disks(self, project, zone, filter=None):
+        labels = dict(re.findall(r'labels\.([\w-]+) = "([^"]*)"', filter or ""))
+        disks = [
+            disk
+            for (disk_zone, _), disk in self.disks.items()
+            if disk_zone == zone and all(disk.get("labels", {}).get(key) == value for key, value in labels.items())
+        ]
+        return {"items": disks}
+
+    def set_disk_labels(self, project, zone, resource, body):
+        disk = self.disks.get((zone, resource))
+        if not disk:
+            raise self.not_found_http_error()
+        if body["labelFingerprint"] != disk["labelFingerprint"]:
+            raise HttpError(httplib2.Response({"status": 412}), b"Label fingerprint does not match")
+        disk["labels"] = body["labels"]
+        disk["labelFingerprint"] = str(next(self.ids))
+        return self.create_operation(zone, "api_call")
+
+    def delete_disk(self, zone, disk):
+        return self.create_operation(zone, "disk_delete", on_done=lambda: self.disks.pop((zone, disk), None))
+
+    def get_snapshot(self, project, snapshot):
+        if snapshot not in self.snapshots:
+            raise self.not_found_http_error()
+        return {"name": snapshot}
+
+    def create_snapshot(self, project, zone, disk, body):
+        return self.create_operation(zone, "snapshot", on_done=lambda: self.snapshots.add(body["name"]))
+
+    def list_zones(self, project, filter=None):
+        return {"items": [{"name": zone} for zone in self.zones]}
+
+    def list_zone_items(self, zone, zones_with_item, item_name):
+        return {"items": [{"name": item_name}] if zone in zones_with_item else []}
+
+    def aggregated_list(self, items_key, zones_with_item, item_name):
+        return {"items": {f"zones/{zone}": {items_key: [{"name": item_name}]} for zone in zones_with_item}}
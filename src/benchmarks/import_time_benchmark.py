@@ -0,0 +1,51 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "0.15"))
+RUNS = 5
+CLOUD_MODULES = ["google", "googleapiclient", "httpx", "requests", "httplib2"]
+
+LOCAL_PATH_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from ml_cloud_connector.MlCloudConnector import MlCloudConnector
+from ml_cloud_connector.ServerType import ServerType
+
+ip = MlCloudConnector(ServerType.TRANSLATION).get_ip()
+elapsed = time.perf_counter() - start
+loaded = sorted({name.split(".")[0] for name in sys.modules})
+print(json.dumps({"ip": ip, "elapsed": elapsed, "modules": loaded}))
+"""
+
+
+def measure_local_path():
+    environment = {**os.environ, "PROJECT_ID": "", "PYTHONPATH": str(Path(__file__).parent.parent)}
+    output = subprocess.check_output(
+        [sys.executable, "-c", LOCAL_PATH_SCRIPT], env=environment, cwd=Path(__file__).parent.parent
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def run():
+    results = [measure_local_path() for _ in range(RUNS)]
+    median_time = statistics.median(result["elapsed"] for result in results)
+    loaded_cloud_modules = sorted({module for result in results for module in result["modules"] if module in CLOUD_MODULES})
+
+    print("local path ip", results[0]["ip"])
+    print("local path import + get_ip median", round(median_time, 3), "s", "budget", IMPORT_TIME_BUDGET, "s")
+    print("cloud modules loaded", loaded_cloud_modules)
+
+    if loaded_cloud_modules or median_time > IMPORT_TIME_BUDGET:
+        print("Import time budget exceeded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,385 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.FakeComputeEngine import FakeComputeEngine, real_sleep, real_async_sleep, DEFAULT_LATENCIES
+
+ZONE = "europe-west4-a"
+INSTANCE = "translation-instance-benchmark"
+
+
+def use_fake_engine(engine: FakeComputeEngine):
+    from ml_cloud_connector.CircuitBreaker import circuit_breakers
+    from ml_cloud_connector.InMemoryMetricsCollector import InMemoryMetricsCollector
+    from ml_cloud_connector.cloud_clients import use_clients
+    from ml_cloud_connector.cloud_errors import get_reconnect_errors, get_request_retry_errors
+    from ml_cloud_connector.metrics import set_metrics
+
+    tempfile.tempdir = tempfile.mkdtemp(prefix="ml-cloud-connector-benchmark-")
+    use_clients(
+        compute_factory=lambda: engine.compute,
+        instances_client=engine.instances_client,
+        disks_client=engine.disks_client,
+    )
+    time.sleep = engine.sleep
+    asyncio.sleep = engine.async_sleep
+    set_metrics(InMemoryMetricsCollector())
+    circuit_breakers.clear()
+    get_request_retry_errors(), get_reconnect_errors()
+
+
+@contextmanager
+def trace_scenario(engine: FakeComputeEngine, name, trace_path: Path = None):
+    from ml_cloud_connector.JsonlSpanWriter import JsonlSpanWriter
+    from ml_cloud_connector.tracing import set_span_writer, span
+
+    clock = lambda: time.monotonic() / engine.time_scale
+    set_span_writer(JsonlSpanWriter(trace_path, clock) if trace_path else None)
+    with span("benchmark", kind="request", scenario=name):
+        yield
+
+
+def get_connector(engine: FakeComputeEngine, service_logger, zone=ZONE, instance=INSTANCE):
+    from ml_cloud_connector.MlCloudConnector import MlCloudConnector
+    from ml_cloud_connector.ServerType import ServerType
+
+    return MlCloudConnector(ServerType.TRANSLATION, service_logger, zone, instance, readiness_check=engine.readiness_check)
+
+
+def measure(engine: FakeComputeEngine, function):
+    calls_before = engine.api_call_count()
+    start = time.monotonic()
+    function()
+    simulated_seconds = (time.monotonic() - start) / engine.time_scale
+    return simulated_seconds, engine.api_call_count() - calls_before
+
+
+def warm_time_to_ip(engine: FakeComputeEngine, service_logger):
+    engine.add_instance(ZONE, INSTANCE)
+    connector = get_connector(engine, service_logger)
+    return measure(engine, connector.get_ip)
+
+
+def hot_time_to_ip(engine: FakeComputeEngine, service_logger):
+    engine.add_instance(ZONE, INSTANCE)
+    connector = get_connector(engine, service_logger)
+    connector.get_ip()
+    return measure(engine, lambda: [connector.get_ip() for _ in range(100)])
+
+
+def cold_time_to_ip(engine: FakeComputeEngine, service_logger):
+    engine.add_instance(ZONE, INSTANCE, status="TERMINATED", service_ready=False)
+    connector = get_connector(engine, service_logger)
+    return measure(engine, connector.get_ip)
+
+
+def get_service_call(engine: FakeComputeEngine, connector):
+    from httpx import ConnectTimeout
+
+    def call_service():
+        if not engine.is_service_ready(connector.get_ip()):
+            raise ConnectTimeout("Service not reachable")
+        return True
+
+    return call_service
+
+
+def preemption_recovery(engine: FakeComputeEngine, service_logger):
+    engine.add_instance(ZONE, INSTANCE)
+    connector = get_connector(engine, service_logger)
+    connector.get_ip()
+    engine.preempt(ZONE, INSTANCE)
+    call_service = get_service_call(engine, connector)
+    return measure(engine, lambda: connector.execute_on_cloud_server(call_service, service_logger))
+
+
+def cold_call_with_deadline(engine: FakeComputeEngine, service_logger):
+    from ml_cloud_connector.Deadline import DEADLINE_EXCEEDED_MESSAGE, Deadline
+
+    engine.add_instance(ZONE, INSTANCE, status="TERMINATED", service_ready=False)
+    connector = get_connector(engine, service_logger)
+    call_service = get_service_call(engine, connector)
+
+    def call_with_deadline():
+        with Deadline(timeout=10, clock=lambda: time.monotonic() / engine.time_scale):
+            _, success, error = connector.execute_on_cloud_server(call_service, service_logger)
+        if success or error != DEADLINE_EXCEEDED_MESSAGE:
+            raise RuntimeError(f"Expected the deadline to be exceeded, got: {error}")
+
+    return measure(engine, call_with_deadline)
+
+
+def watched_preemption_recovery(engine: FakeComputeEngine, service_logger):
+    from ml_cloud_connector.MlCloudInstanceWatcher import MlCloudInstanceWatcher
+
+    engine.add_instance(ZONE, INSTANCE)
+    connector = get_connector(engine, service_logger)
+    connector.get_ip()
+    watcher = MlCloudInstanceWatcher(connector, interval=5 * engine.time_scale).start()
+    engine.sleep(10)
+    engine.preempt(ZONE, INSTANCE)
+    engine.sleep(60)
+    call_service = get_service_call(engine, connector)
+    try:
+        return measure(engine, lambda: connector.execute_on_cloud_server(call_service, service_logger))
+    finally:
+        watcher.stop()
+
+
+def parallel_preemption_recovery(engine: FakeComputeEngine, service_logger):
+    engine.add_instance(ZONE, INSTANCE)
+    connectors = [get_connector(engine, service_logger) for _ in range(8)]
+    connectors[0].get_ip()
+    engine.preempt(ZONE, INSTANCE)
+
+    def call_in_parallel():
+        with ThreadPoolExecutor(max_workers=len(connectors)) as executor:
+            futures = [
+                executor.submit(connector.execute_on_cloud_server, get_service_call(engine, connector), service_logger)
+                for connector in connectors
+            ]
+            if not all(future.result()[1] for future in futures):
+                raise RuntimeError("A parallel request did not succeed")
+
+    return measure(engine, call_in_parallel)
+
+
+def async_preemption_recovery(engine: FakeComputeEngine, service_logger):
+    from httpx import ConnectTimeout
+    from ml_cloud_connector.AsyncMlCloudConnector import AsyncMlCloudConnector
+
+    engine.add_instance(ZONE, INSTANCE)
+    async_connector = AsyncMlCloudConnector(get_connector(engine, service_logger))
+    async_connector.connector.get_ip()
+    engine.preempt(ZONE, INSTANCE)
+
+    async def call_service():
+        if not engine.is_service_ready(await async_connector.get_ip()):
+            raise ConnectTimeout("Service not reachable")
+        return True
+
+    async def call_concurrently():
+        results = await asyncio.gather(
+            *[async_connector.execute_on_cloud_server(call_service, service_logger) for _ in range(200)]
+        )
+        if not all(success for _, success, _ in results):
+            raise RuntimeError("A concurrent request did not succeed")
+
+    return measure(engine, lambda: asyncio.run(call_concurrently()))
+
+
+def prewarmed_time_to_ip(engine: FakeComputeEngine, service_logger):
+    engine.add_instance(ZONE, INSTANCE, status="TERMINATED", service_ready=False)
+    connector = get_connector(engine, service_logger)
+    connector.prewarm(keepalive_seconds=3600).join()
+    return measure(engine, connector.get_ip)
+
+
+def batch_execution(engine: FakeComputeEngine, service_logger):
+    engine.add_instance(ZONE, INSTANCE)
+    connector = get_connector(engine, service_logger)
+    connector.get_ip()
+
+    def translate(segment):
+        connector.get_ip()
+        time.sleep(engine.latencies["api_call"])
+        return segment
+
+    def translate_all():
+        results = connector.execute_batch_on_cloud_server(translate, service_logger, range(64), max_workers=8)
+        if [value for _, (value, _, _) in results] != list(range(64)):
+            raise RuntimeError("Batch results out of order")
+
+    return measure(engine, translate_all)
+
+
+def spooled_translation(segment):
+    time.sleep(DEFAULT_LATENCIES["api_call"])
+    return segment
+
+
+def spooled_cold_start(engine: FakeComputeEngine, service_logger):
+    from ml_cloud_connector.MlCloudRequestSpool import MlCloudRequestSpool
+
+    engine.add_instance(ZONE, INSTANCE, status="TERMINATED", service_ready=False)
+    connector = get_connector(engine, service_logger)
+    spool = MlCloudRequestSpool(connector, max_concurrency=8).start()
+
+    def submit_and_drain():
+        job_ids = [spool.submit(spooled_translation, args=(segment,)) for segment in range(32)]
+        futures = [spool.get_future(job_id) for job_id in job_ids]
+        if [future.result()[0] for future in futures] != list(range(32)):
+            raise RuntimeError("Spooled jobs returned wrong results")
+
+    try:
+        return measure(engine, submit_and_drain)
+    finally:
+        spool.stop()
+
+
+def pool_preemption(engine: FakeComputeEngine, service_logger):
+    from ml_cloud_connector.MlCloudConnectorPool import MlCloudConnectorPool
+    from ml_cloud_connector.ServerType import ServerType
+    from httpx import ConnectTimeout
+
+    pool = MlCloudConnectorPool(
+        ServerType.TRANSLATION, service_logger, min_instances=2, readiness_check=engine.readiness_check
+    )
+    pool.get_ip()
+    while len(pool.active_slots) < 2:
+        real_sleep(0.01)
+    engine.preempt(pool.members[0].zone, pool.members[0].instance)
+
+    def translate(segment):
+        if not engine.is_service_ready(pool.get_ip()):
+            raise ConnectTimeout("Service not reachable")
+        time.sleep(engine.latencies["api_call"])
+        return segment
+
+    def translate_all():
+        results = pool.execute_batch_on_cloud_server(translate, service_logger, range(64), max_workers=8)
+        if [value for _, (value, _, _) in results] != list(range(64)):
+            raise RuntimeError("Pool results out of order")
+
+    return measure(engine, translate_all)
+
+
+def pool_scale_out(engine: FakeComputeEngine, service_logger):
+    from ml_cloud_connector.MlCloudConnectorPool import MlCloudConnectorPool
+    from ml_cloud_connector.ServerType import ServerType
+
+    def start_pool():
+        pool = MlCloudConnectorPool(
+            ServerType.TRANSLATION, service_logger, min_instances=3, readiness_check=engine.readiness_check
+        )
+        pool.get_ip()
+        while len(pool.active_slots) < 3:
+            if not pool.scaling_slots:
+                raise RuntimeError("Pool did not scale out to 3 instances")
+            real_sleep(0.01)
+        zones = [member.zone for member in pool.members.values()]
+        if len(set(zones)) != len(zones):
+            raise RuntimeError(f"Pool instances share zones: {zones}")
+
+    return measure(engine, start_pool)
+
+
+def failover_time_to_ip(engine: FakeComputeEngine, service_logger):
+    engine.exhausted_zones = {"europe-west4-a", "europe-west4-b"}
+    return measure(engine, lambda: get_connector(engine, service_logger, zone=None, instance=None).get_ip())
+
+
+def failover_provisioning(fan_out, standby_disks_per_zone=0, source_image=""):
+    def scenario(engine: FakeComputeEngine, service_logger):
+        from ml_cloud_connector.MlCloudInstanceOperator import MlCloudInstanceOperator
+        from ml_cloud_connector.MlCloudStandbyDiskPool import MlCloudStandbyDiskPool
+        from ml_cloud_connector.ServerProfile import ServerProfile
+        from ml_cloud_connector.ServerType import ServerType
+        from ml_cloud_connector.cloud_clients import get_compute
+
+        engine.exhausted_zones = {"europe-west4-a", "europe-west4-b"}
+        instance_operator = MlCloudInstanceOperator("benchmark-project", service_logger, ServerType.TRANSLATION)
+        if source_image:
+            instance_operator.server_profile = ServerProfile(source_image=source_image)
+        if standby_disks_per_zone:
+            instance_operator.standby_disk_pool = MlCloudStandbyDiskPool(
+                "benchmark-project", service_logger, ServerType.TRANSLATION, disks_per_zone=standby_disks_per_zone
+            )
+            instance_operator.standby_disk_pool.top_up()
+        return measure(engine, lambda: instance_operator.create_instance_from_snapshot(get_compute(), fan_out=fan_out))
+
+    return scenario
+
+
+LATENCY_BUDGETS = {
+    "warm time-to-ip": 5,
+    "hot time-to-ip (100 calls)": 1,
+    "cold time-to-ip": 120,
+    "prewarmed time-to-ip": 5,
+    "preemption recovery": 150,
+    "cold call with 10 s deadline": 11,
+    "watched preemption (call 60 s later)": 30,
+    "parallel preemption recovery (8 callers)": 150,
+    "async preemption recovery (200 callers)": 150,
+    "batch of 64 calls (8 workers)": 5,
+    "spooled cold start (32 jobs)": 120,
+    "pool preemption (2 instances, 64 calls)": 10,
+    "pool scale-out (3 instances)": 500,
+    "failover provisioning": 600,
+    "failover time-to-ip": 600,
+    "failover provisioning (fan-out 3)": 150,
+    "failover provisioning (standby disks)": 300,
+    "failover provisioning (image boot)": 320,
+}
+
+SCENARIOS = {
+    "warm time-to-ip": warm_time_to_ip,
+    "hot time-to-ip (100 calls)": hot_time_to_ip,
+    "cold time-to-ip": cold_time_to_ip,
+    "prewarmed time-to-ip": prewarmed_time_to_ip,
+    "preemption recovery": preemption_recovery,
+    "cold call with 10 s deadline": cold_call_with_deadline,
+    "watched preemption (call 60 s later)": watched_preemption_recovery,
+    "parallel preemption recovery (8 callers)": parallel_preemption_recovery,
+    "async preemption recovery (200 callers)": async_preemption_recovery,
+    "batch of 64 calls (8 workers)": batch_execution,
+    "spooled cold start (32 jobs)": spooled_cold_start,
+    "pool preemption (2 instances, 64 calls)": pool_preemption,
+    "pool scale-out (3 instances)": pool_scale_out,
+    "failover provisioning": failover_provisioning(fan_out=1),
+    "failover time-to-ip": failover_time_to_ip,
+    "failover provisioning (fan-out 3)": failover_provisioning(fan_out=3),
+    "failover provisioning (standby disks)": failover_provisioning(fan_out=1, standby_disks_per_zone=1),
+    "failover provisioning (image boot)": failover_provisioning(fan_out=1, source_image="translation-server-image"),
+}
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark the connector against a fake Compute Engine backend")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="Real seconds per simulated second")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Run only these scenarios")
+    parser.add_argument("--metrics", action="store_true", help="Print the connector metrics collected in each scenario")
+    parser.add_argument("--trace", type=Path, help="Append the spans of each scenario to a JSONL trace file")
+    arguments = parser.parse_args()
+
+    os.environ["PROJECT_ID"] = "benchmark-project"
+    service_logger = logging.getLogger("benchmark")
+    service_logger.addHandler(logging.NullHandler())
+    service_logger.propagate = False
+
+    print(f"{'scenario':<40}{'simulated s':>14}{'budget s':>10}{'api calls':>12}")
+    over_budget = []
+    for name in arguments.scenario or SCENARIOS:
+        engine = FakeComputeEngine(time_scale=arguments.time_scale)
+        use_fake_engine(engine)
+        try:
+            with trace_scenario(engine, name, arguments.trace):
+                simulated_seconds, api_calls = SCENARIOS[name](engine, service_logger)
+        finally:
+            time.sleep = real_sleep
+            asyncio.sleep = real_async_sleep
+        print(f"{name:<40}{simulated_seconds:>14.1f}{LATENCY_BUDGETS[name]:>10}{api_calls:>12}")
+        if arguments.metrics:
+            from ml_cloud_connector.metrics import get_metrics
+
+            print(json.dumps(get_metrics().get_summary(), indent=4))
+        if simulated_seconds > LATENCY_BUDGETS[name]:
+            over_budget.append(name)
+
+    if over_budget:
+        print("Latency budget exceeded:", ", ".join(over_budget))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,414 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Callable
+
+from ml_cloud_connector import configuration
+from ml_cloud_connector.Deadline import (
+    DEADLINE_MESSAGES,
+    DeadlineExceeded,
+    async_run_shielded,
+    async_wait,
+    check_deadline,
+    get_wait_timeout,
+    run_shielded,
+)
+from ml_cloud_connector.MlCloudBatchExecutor import MlCloudBatchExecutor
+from ml_cloud_connector.MlCloudConnector import MlCloudConnector, POWER_LEASE, CIRCUIT_OPEN_MESSAGE
+from ml_cloud_connector.MlCloudRetryState import (
+    GIVE_UP,
+    NO_RESPONSE_MESSAGE,
+    RECOVER,
+    REQUEST_RETRY_SECONDS,
+    RETRIES_EXHAUSTED_MESSAGE,
+    RETRY_REQUEST,
+    SWITCH_INSTANCE,
+    MlCloudRetryState,
+)
+from ml_cloud_connector.ServerType import ServerType
+from ml_cloud_connector.metrics import async_sleep
+from ml_cloud_connector.tracing import span
+
+
+class AsyncMlCloudConnector:
+    def __init__(self, connector: MlCloudConnector):
+        self.connector = connector
+        self.flights: dict[str, asyncio.Task] = {}
+
+    @classmethod
+    async def create(cls, server_type: ServerType, service_logger=None, zone=None, instance=None):
+        connector = await asyncio.to_thread(MlCloudConnector, server_type, service_logger, zone, instance)
+        return cls(connector)
+
+    @property
+    def service_logger(self):
+        return self.connector.service_logger
+
+    @property
+    def metrics(self):
+        return self.connector.metrics
+
+    async def run_single_flight(self, key: str, function: Callable):
+        task = self.flights.get(key)
+        if not task:
+            task = asyncio.ensure_future(function())
+            self.flights[key] = task
+            task.add_done_callback(lambda _: self.flights.pop(key, None))
+        try:
+            return await async_wait(asyncio.shield(task))
+        except DeadlineExceeded:
+            check_deadline()
+            return await self.run_single_flight(key, function)
+
+    async def is_active(self):
+        return await asyncio.to_thread(self.connector.is_active)
+
+    async def wait_for_other_process(self, lease_name):
+        self.service_logger.info(f"Another process holds the {lease_name} lease. Waiting for it to finish...")
+        while await asyncio.to_thread(self.connector.state_store.is_lease_held, lease_name):
+            await async_sleep(2, "lease_wait", self.metrics)
+        await asyncio.to_thread(self.connector.load_instance_from_store)
+
+    async def run_with_power_lease(self, function: Callable):
+        state_store = self.connector.state_store
+        lease_owner = f"{self.connector.get_lease_owner()}-{id(asyncio.current_task())}"
+        if not await asyncio.to_thread(
+            state_store.acquire_lease, POWER_LEASE, lease_owner, configuration.POWER_LEASE_SECONDS
+        ):
+            return None
+        try:
+            return await function()
+        finally:
+            await asyncio.to_thread(state_store.release_lease, POWER_LEASE, lease_owner)
+
+    async def start_attempt_with_instance_switch(self):
+        return await self.run_single_flight("start_attempt_with_instance_switch", self.start_instance_with_switch)
+
+    async def start_instance_with_switch(self):
+        while not await self.start():
+            switched = await asyncio.to_thread(run_shielded, self.connector.switch_to_new_instance)
+            if switched:
+                self.metrics.increment("instance_switches")
+                await self.stop()
+                await async_sleep(120, "instance_switch", self.metrics)
+            else:
+                wait_time = 300
+                self.metrics.increment("instance_switch_failures")
+                self.service_logger.info("Switching to new instance failed on all available zones.")
+                self.service_logger.info(f"The process will be restarted after {wait_time} seconds.")
+                await async_sleep(wait_time, "instance_switch_failure", self.metrics)
+
+    async def start(self):
+        return await self.run_single_flight("start", self.start_instance)
+
+    async def start_instance(self):
+        with self.metrics.timed("start"):
+            return await self.start_instance_with_lease()
+
+    async def start_instance_with_lease(self):
+        while True:
+            if await self.is_active():
+                return True
+
+            started = await self.run_with_power_lease(self.start_and_wait)
+            if started is not None:
+                return started
+
+            await self.wait_for_other_process(POWER_LEASE)
+            instance_state = self.connector.instance_state
+            if instance_state.is_fresh() and instance_state.status == "RUNNING":
+                return True
+
+    async def start_and_wait(self):
+        await asyncio.to_thread(self.connector.request_start)
+        self.connector.boot_pending = True
+
+        for i in range(100):
+            if await self.is_active():
+                return True
+            await async_sleep(5, "power_poll", self.metrics)
+            await asyncio.to_thread(self.connector.request_start)
+        return False
+
+    async def stop(self):
+        return await self.run_single_flight("stop", self.stop_instance)
+
+    async def stop_instance(self):
+        with self.metrics.timed("stop"):
+            return await self.stop_instance_with_lease()
+
+    async def stop_instance_with_lease(self):
+        while True:
+            if not await self.is_active():
+                self.service_logger.info("Already stopped")
+                return True
+
+            stopped = await self.run_with_power_lease(self.stop_and_wait)
+            if stopped is not None:
+                return stopped
+
+            await self.wait_for_other_process(POWER_LEASE)
+            instance_state = self.connector.instance_state
+            if instance_state.is_fresh() and instance_state.status == "TERMINATED":
+                self.service_logger.info("Already stopped")
+                return True
+
+    async def stop_and_wait(self):
+        await asyncio.to_thread(self.connector.request_stop)
+
+        for i in range(100):
+            if not await self.is_active():
+                self.service_logger.info("stopped")
+                return True
+            await async_sleep(5, "power_poll", self.metrics)
+            await asyncio.to_thread(self.connector.request_stop)
+        return False
+
+    async def restart(self):
+        return await self.run_single_flight("restart", self.restart_instance)
+
+    async def restart_instance(self):
+        if not await self.stop():
+            return False
+        return await self.start()
+
+    async def get_ip(self):
+        if not self.connector.client:
+            return "localhost"
+
+        fresh_ip = await asyncio.to_thread(self.connector.get_fresh_ip)
+        if fresh_ip:
+            self.metrics.increment("instance_state_hits")
+            return fresh_ip
+
+        self.metrics.increment("instance_state_misses")
+        connector = self.connector
+        with span("get_ip", kind="request", server_type=connector.server_type.value, slot=connector.slot) as traced_span:
+            await self.start_attempt_with_instance_switch()
+            ip_address = await asyncio.to_thread(connector.get_started_instance_ip)
+            if await self.wait_until_ready(ip_address) and traced_span and connector.boot_pending:
+                await asyncio.to_thread(connector.record_boot_timings)
+        return ip_address
+
+    async def keep_alive(self, seconds):
+        return await asyncio.to_thread(self.connector.keep_alive, seconds)
+
+    async def get_boot_timings(self):
+        return await asyncio.to_thread(self.connector.get_boot_timings)
+
+    def prewarm(self, keepalive_seconds=0):
+        async def warm():
+            try:
+                if keepalive_seconds:
+                    await self.keep_alive(keepalive_seconds)
+                await self.get_ip()
+            except Exception as e:
+                self.service_logger.warning(f"Prewarm failed: {e}")
+
+        return asyncio.ensure_future(warm())
+
+    async def wait_until_ready(self, ip_address, timeout=None):
+        with self.metrics.timed("readiness"):
+            return await self.wait_until_service_ready(ip_address, timeout)
+
+    async def wait_until_service_ready(self, ip_address, timeout=None):
+        timeout = timeout or configuration.READINESS_TIMEOUT
+        deadline = time.time() + timeout
+        probe_interval = 0.25
+        while not await asyncio.to_thread(self.connector.is_service_ready, ip_address):
+            if time.time() + probe_interval > deadline:
+                self.service_logger.warning(f"Service on {ip_address} not ready after {timeout} seconds")
+                return False
+            await async_sleep(probe_interval, "readiness_probe", self.metrics)
+            probe_interval = min(probe_interval * 1.5, 5)
+
+        await asyncio.to_thread(self.connector.mark_service_ready, ip_address)
+        return True
+
+    async def wait_for_service_if_booting(self):
+        if not self.connector.readiness_check or not await self.is_active():
+            return False
+
+        ip_address = await asyncio.to_thread(self.connector.get_started_instance_ip)
+        if await asyncio.to_thread(self.connector.is_service_ready, ip_address):
+            return False
+
+        self.service_logger.info("Instance is running but the service is still booting. Waiting for it...")
+        return await self.wait_until_ready(ip_address)
+
+    async def wait_for_operation(self, operation):
+        from ml_cloud_connector.wait_for_operation import async_wait_for_operation
+
+        await async_wait_for_operation(self.connector.project, operation, self.service_logger, self.metrics)
+
+    @staticmethod
+    async def call(function: Callable, *args, **kwargs):
+        if inspect.iscoroutinefunction(function):
+            return await function(*args, **kwargs)
+        return await asyncio.to_thread(function, *args, **kwargs)
+
+    async def is_request_allowed(self, service_logger: logging.Logger):
+        circuit_breaker = self.connector.circuit_breaker
+        if circuit_breaker.allow_request():
+            return True
+        if self.connector.fail_fast:
+            self.metrics.increment("circuit_breaker_rejections")
+            return False
+        service_logger.info("Cloud server is recovering. Waiting for the circuit breaker...")
+        while not circuit_breaker.allow_request():
+            await circuit_breaker.async_wait_for_recovery(get_wait_timeout())
+        return True
+
+    async def handle_cloud_error(self, error: Exception, retry_state: MlCloudRetryState):
+        action = retry_state.record_error(error)
+        await asyncio.to_thread(self.connector.invalidate_instance_state)
+        if action == RETRY_REQUEST:
+            await async_sleep(REQUEST_RETRY_SECONDS, "request_retry", self.metrics)
+        elif action == RECOVER:
+            await async_run_shielded(self.run_recovery)
+        elif action == SWITCH_INSTANCE:
+            await asyncio.to_thread(self.connector.forget_cloud_instance, self.connector.server_type, self.connector.slot)
+        return RETRIES_EXHAUSTED_MESSAGE if action == GIVE_UP else ""
+
+    async def execute_on_cloud_server(
+        self, function: Callable, service_logger: logging.Logger, *args, **kwargs
+    ) -> (object, bool, str):
+        bound_args = self.connector.bind_arguments(function, *args, **kwargs)
+        self.connector.extend_keep_alive_for_traffic()
+
+        retry_state = MlCloudRetryState(self.connector, service_logger)
+        try:
+            while retry_state.has_attempts_left():
+                if not await self.is_request_allowed(service_logger):
+                    return None, False, CIRCUIT_OPEN_MESSAGE
+
+                try:
+                    return_value = await self.call(function, *bound_args.args, **bound_args.kwargs)
+                    self.connector.circuit_breaker.record_success()
+                    return return_value, True, ""
+                except DeadlineExceeded:
+                    self.connector.circuit_breaker.release_probe()
+                    raise
+                except Exception as e:
+                    error_message = await self.handle_cloud_error(e, retry_state)
+                    if error_message:
+                        return None, False, error_message
+        except DeadlineExceeded as e:
+            self.metrics.increment("deadline_exceeded")
+            return None, False, str(e)
+        return None, False, NO_RESPONSE_MESSAGE
+
+    @staticmethod
+    async def iterate(chunks):
+        if hasattr(chunks, "__aiter__"):
+            async for chunk in chunks:
+                yield chunk
+            return
+
+        iterator = iter(chunks)
+        end_of_stream = object()
+        while (chunk := await asyncio.to_thread(next, iterator, end_of_stream)) is not end_of_stream:
+            yield chunk
+
+    async def execute_stream_on_cloud_server(
+        self,
+        function: Callable,
+        service_logger: logging.Logger,
+        args: tuple = (),
+        kwargs: dict = None,
+        resume: Callable = None,
+        on_restart: Callable = None,
+    ):
+        circuit_breaker = self.connector.circuit_breaker
+        self.connector.extend_keep_alive_for_traffic()
+        received_chunks = []
+        received_count = 0
+        start_time = time.perf_counter()
+        retry_state = MlCloudRetryState(self.connector, service_logger)
+        while retry_state.has_attempts_left():
+            if not await self.is_request_allowed(service_logger):
+                raise Exception(CIRCUIT_OPEN_MESSAGE)
+
+            try:
+                if received_count and resume:
+                    position = received_count
+                    chunks = await self.call(resume, list(received_chunks))
+                else:
+                    if received_count and on_restart:
+                        await self.call(on_restart)
+                        received_chunks, received_count = [], 0
+                    position = 0
+                    chunks = await self.call(function, *args, **(kwargs or {}))
+
+                async for chunk in self.iterate(chunks):
+                    position += 1
+                    if position <= received_count:
+                        continue
+                    if not received_count:
+                        self.metrics.observe_latency("time_to_first_chunk", time.perf_counter() - start_time)
+                    if resume:
+                        received_chunks.append(chunk)
+                    received_count += 1
+                    yield chunk
+
+                circuit_breaker.record_success()
+                return
+            except GeneratorExit:
+                if received_count:
+                    circuit_breaker.record_success()
+                else:
+                    circuit_breaker.release_probe()
+                raise
+            except DeadlineExceeded:
+                circuit_breaker.release_probe()
+                self.metrics.increment("deadline_exceeded")
+                raise
+            except Exception as e:
+                if received_count:
+                    self.metrics.increment("stream_interruptions")
+                error_message = await self.handle_cloud_error(e, retry_state)
+                if error_message:
+                    raise Exception(error_message)
+        raise Exception(NO_RESPONSE_MESSAGE)
+
+    async def execute_batch_on_cloud_server(
+        self, function: Callable, service_logger: logging.Logger, argument_sets, max_concurrency=8
+    ):
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def execute(arguments):
+            args, kwargs = MlCloudBatchExecutor.get_call_arguments(arguments)
+            async with semaphore:
+                result = await self.execute_on_cloud_server(function, service_logger, *args, **kwargs)
+                if not result[1] and result[2] not in DEADLINE_MESSAGES:
+                    try:
+                        await self.connector.circuit_breaker.async_wait_for_recovery(get_wait_timeout())
+                    except DeadlineExceeded as e:
+                        return None, False, str(e)
+                    self.metrics.increment("batch_resubmissions")
+                    result = await self.execute_on_cloud_server(function, service_logger, *args, **kwargs)
+                return result
+
+        return await asyncio.gather(*[execute(arguments) for arguments in argument_sets])
+
+    async def run_recovery(self):
+        try:
+            self.metrics.increment("circuit_breaker_recoveries")
+            await self.recover_cloud_server()
+        except Exception as e:
+            self.service_logger.error(f"Cloud server recovery failed: {e}")
+        finally:
+            self.connector.circuit_breaker.finish_recovery()
+
+    async def recover_cloud_server(self):
+        circuit_breaker = self.connector.circuit_breaker
+        if await self.wait_for_service_if_booting():
+            return
+        await self.stop()
+        await async_sleep(circuit_breaker.connection_wait_time, "reconnect_backoff", self.metrics)
+        circuit_breaker.connection_wait_time = self.connector.get_next_connection_wait_time(
+            circuit_breaker.connection_wait_time
+        )
+        await self.start_attempt_with_instance_switch()
+        await async_sleep(30, "reconnect", self.metrics)
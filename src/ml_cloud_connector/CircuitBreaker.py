@@ -0,0 +1,143 @@
+import threading
+import time
+
+from ml_cloud_connector import configuration
+from ml_cloud_connector.ServerType import ServerType
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30, half_open_probes: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.condition = threading.Condition()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.recovering = False
+        self.probes_in_flight = 0
+        self.connection_wait_time = 0
+        self.async_waiters = []
+
+    def is_probe_available(self):
+        if self.state == OPEN and not self.recovering and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+        return self.state == HALF_OPEN and not self.recovering and self.probes_in_flight < self.half_open_probes
+
+    def allow_request(self) -> bool:
+        with self.condition:
+            if self.state == CLOSED:
+                return True
+            if self.is_probe_available():
+                self.probes_in_flight += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self.condition:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.probes_in_flight = 0
+            self.connection_wait_time = 0
+            self.notify_waiters()
+
+    def record_failure(self):
+        with self.condition:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.open()
+            self.notify_waiters()
+
+    def release_probe(self):
+        with self.condition:
+            self.probes_in_flight = max(self.probes_in_flight - 1, 0)
+            self.notify_waiters()
+
+    def open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probes_in_flight = 0
+
+    def try_start_recovery(self) -> bool:
+        with self.condition:
+            if self.recovering:
+                return False
+            self.recovering = True
+            self.open()
+            return True
+
+    def finish_recovery(self):
+        with self.condition:
+            self.recovering = False
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+            self.notify_waiters()
+
+    def notify_waiters(self):
+        self.condition.notify_all()
+        for loop, event in self.async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                continue
+
+    def is_recovered(self):
+        return self.state == CLOSED or self.is_probe_available()
+
+    def get_recovery_wait_time(self, deadline):
+        remaining = deadline - time.monotonic() if deadline else None
+        if self.state == OPEN and not self.recovering and (remaining is None or remaining > 0):
+            reopen_in = self.opened_at + self.reset_timeout - time.monotonic()
+            remaining = min(remaining, reopen_in) if remaining is not None else reopen_in
+        return remaining
+
+    def wait_for_recovery(self, timeout: float = None) -> bool:
+        deadline = time.monotonic() + timeout if timeout else None
+        with self.condition:
+            while not self.is_recovered():
+                if deadline and deadline - time.monotonic() <= 0:
+                    return False
+                self.condition.wait(self.get_recovery_wait_time(deadline))
+            return True
+
+    async def async_wait_for_recovery(self, timeout: float = None) -> bool:
+        import asyncio
+
+        deadline = time.monotonic() + timeout if timeout else None
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.condition:
+            self.async_waiters.append(waiter)
+        try:
+            while True:
+                with self.condition:
+                    if self.is_recovered():
+                        return True
+                    if deadline and deadline - time.monotonic() <= 0:
+                        return False
+                    waiter[1].clear()
+                    wait_time = self.get_recovery_wait_time(deadline)
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), wait_time)
+                except asyncio.TimeoutError:
+                    continue
+        finally:
+            with self.condition:
+                self.async_waiters.remove(waiter)
+
+
+circuit_breakers: dict[tuple[ServerType, int], CircuitBreaker] = {}
+circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(server_type: ServerType, slot: int = 0) -> CircuitBreaker:
+    with circuit_breakers_lock:
+        if (server_type, slot) not in circuit_breakers:
+            circuit_breakers[(server_type, slot)] = CircuitBreaker(
+                configuration.CIRCUIT_BREAKER_FAILURE_THRESHOLD, configuration.CIRCUIT_BREAKER_RESET_TIMEOUT
+            )
+        return circuit_breakers[(server_type, slot)]
@@ -0,0 +1,144 @@
+import threading
+import time
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Callable
+
+DEADLINE_EXCEEDED_MESSAGE = "Deadline exceeded before the response was returned."
+CANCELLED_MESSAGE = "Request cancelled."
+RETRY_BUDGET_EXHAUSTED_MESSAGE = "Retry budget exhausted before the response was returned."
+DEADLINE_MESSAGES = (DEADLINE_EXCEEDED_MESSAGE, CANCELLED_MESSAGE, RETRY_BUDGET_EXHAUSTED_MESSAGE)
+
+CANCEL_CHECK_INTERVAL = 1
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+current_deadline: ContextVar["Deadline"] = ContextVar("current_deadline", default=None)
+
+
+class Deadline:
+    def __init__(self, timeout: float = None, max_retries: int = None, clock: Callable = time.monotonic):
+        self.clock = clock
+        self.expires_at = clock() + timeout if timeout is not None else None
+        self.max_retries = max_retries
+        self.retries = 0
+        self.cancelled = threading.Event()
+        self.tokens = []
+
+    def __enter__(self):
+        self.tokens.append(current_deadline.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        current_deadline.reset(self.tokens.pop())
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def get_remaining(self):
+        return self.expires_at - self.clock() if self.expires_at is not None else None
+
+    def check(self, seconds_needed: float = 0):
+        if self.cancelled.is_set():
+            raise DeadlineExceeded(CANCELLED_MESSAGE)
+        remaining = self.get_remaining()
+        if remaining is not None and remaining < max(seconds_needed, 0.001):
+            raise DeadlineExceeded(DEADLINE_EXCEEDED_MESSAGE)
+
+    def spend_retry(self):
+        self.retries += 1
+        if self.max_retries is not None and self.retries > self.max_retries:
+            raise DeadlineExceeded(RETRY_BUDGET_EXHAUSTED_MESSAGE)
+
+    def get_wait_timeout(self, timeout: float = None):
+        self.check()
+        wait_timeouts = [CANCEL_CHECK_INTERVAL, self.get_remaining(), timeout]
+        return min(wait_timeout for wait_timeout in wait_timeouts if wait_timeout is not None)
+
+    def sleep(self, seconds: float):
+        self.check(seconds)
+        while seconds > 0:
+            time.sleep(min(seconds, CANCEL_CHECK_INTERVAL))
+            seconds -= CANCEL_CHECK_INTERVAL
+            self.check()
+
+    async def async_sleep(self, seconds: float):
+        import asyncio
+
+        self.check(seconds)
+        while seconds > 0:
+            await asyncio.sleep(min(seconds, CANCEL_CHECK_INTERVAL))
+            seconds -= CANCEL_CHECK_INTERVAL
+            self.check()
+
+
+def get_current_deadline() -> Deadline:
+    return current_deadline.get()
+
+
+def check_deadline():
+    deadline = get_current_deadline()
+    if deadline:
+        deadline.check()
+
+
+def spend_retry():
+    deadline = get_current_deadline()
+    if deadline:
+        deadline.spend_retry()
+
+
+def get_wait_timeout(timeout: float = None):
+    deadline = get_current_deadline()
+    return deadline.get_wait_timeout(timeout) if deadline else timeout
+
+
+def wait_for_event(event: threading.Event):
+    while not event.wait(get_wait_timeout()):
+        pass
+
+
+async def async_wait(awaitable):
+    import asyncio
+
+    future = asyncio.ensure_future(awaitable)
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=get_wait_timeout())
+        if done:
+            return future.result()
+
+
+async def async_run_shielded(function: Callable):
+    import asyncio
+
+    async def run():
+        current_deadline.set(None)
+        return await function()
+
+    if not get_current_deadline():
+        return await function()
+    return await async_wait(asyncio.shield(asyncio.ensure_future(run())))
+
+
+def run_shielded(function: Callable, *args):
+    if not get_current_deadline():
+        return function(*args)
+
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(function(*args))
+        except BaseException as error:
+            future.set_exception(error)
+
+    threading.Thread(target=run, daemon=True).start()
+    while True:
+        try:
+            return future.result(get_wait_timeout())
+        except TimeoutError:
+            if future.done():
+                raise
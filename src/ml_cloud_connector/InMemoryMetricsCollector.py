@@ -0,0 +1,81 @@
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from ml_cloud_connector.MetricsHook import MetricsHook
+
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def get_percentile(self, percentile: float):
+        if not self.count:
+            return 0.0
+        target = percentile / 100 * self.count
+        cumulative = 0
+        for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), self.bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return upper_bound
+        return float("inf")
+
+
+class InMemoryMetricsCollector(MetricsHook):
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.api_calls = Counter()
+        self.api_call_latencies: dict[str, Histogram] = {}
+        self.latencies: dict[str, Histogram] = {}
+        self.counters = Counter()
+        self.sleep_seconds = Counter()
+
+    def get_histogram(self, histograms: dict, name: str):
+        if name not in histograms:
+            histograms[name] = Histogram(self.buckets)
+        return histograms[name]
+
+    def record_api_call(self, method: str, outcome: str, seconds: float):
+        with self.lock:
+            self.api_calls[(method, outcome)] += 1
+            self.get_histogram(self.api_call_latencies, method).observe(seconds)
+
+    def observe_latency(self, name: str, seconds: float):
+        with self.lock:
+            self.get_histogram(self.latencies, name).observe(seconds)
+
+    def increment(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def record_sleep(self, reason: str, seconds: float):
+        with self.lock:
+            self.sleep_seconds[reason] += seconds
+
+    def get_summary(self):
+        with self.lock:
+            return {
+                "api_calls": {f"{method} {outcome}": count for (method, outcome), count in self.api_calls.items()},
+                "latencies": {
+                    name: {
+                        "count": histogram.count,
+                        "sum": round(histogram.sum, 3),
+                        "p50": histogram.get_percentile(50),
+                        "p95": histogram.get_percentile(95),
+                    }
+                    for name, histogram in self.latencies.items()
+                },
+                "counters": dict(self.counters),
+                "sleep_seconds": {reason: round(seconds, 3) for reason, seconds in self.sleep_seconds.items()},
+            }
@@ -0,0 +1,51 @@
+import time
+
+
+class InstanceState:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.status = None
+        self.ip_address = None
+        self.last_verified = 0.0
+        self.ready = False
+        self.guest_accelerators = None
+        self.api_calls_saved = 0
+
+    def update(self, instance_info):
+        ip_address = self.get_nat_ip(instance_info)
+        if instance_info.status != "RUNNING" or ip_address != self.ip_address:
+            self.ready = False
+        self.status = instance_info.status
+        self.ip_address = ip_address
+        self.guest_accelerators = list(instance_info.guest_accelerators)
+        self.last_verified = time.time()
+
+    def load(self, status, ip_address, last_verified, ready=False):
+        if last_verified <= self.last_verified:
+            return
+        self.status = status
+        self.ip_address = ip_address
+        self.last_verified = last_verified
+        self.ready = ready
+
+    @staticmethod
+    def get_nat_ip(instance_info):
+        if not instance_info.network_interfaces or not instance_info.network_interfaces[0].access_configs:
+            return None
+        return instance_info.network_interfaces[0].access_configs[0].nat_i_p or None
+
+    def is_fresh(self):
+        return self.status is not None and time.time() - self.last_verified < self.ttl
+
+    def get_fresh_ip(self):
+        if not self.is_fresh() or self.status != "RUNNING" or not self.ip_address or not self.ready:
+            return None
+        self.api_calls_saved += 1
+        return self.ip_address
+
+    def invalidate(self):
+        self.status = None
+        self.ip_address = None
+        self.last_verified = 0.0
+        self.ready = False
+        self.guest_accelerators = None
@@ -0,0 +1,18 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+
+class JsonlSpanWriter:
+    def __init__(self, path: Path, clock: Callable = time.time):
+        self.path = Path(path)
+        self.clock = clock
+        self.lock = threading.Lock()
+
+    def write(self, span: dict):
+        line = json.dumps(span) + "\n"
+        with self.lock:
+            with open(self.path, "a") as trace_file:
+                trace_file.write(line)
@@ -0,0 +1,10 @@
+class MachineConfiguration:
+    def __init__(self, machine_type: str = "g2-standard-4", accelerator_type: str = "nvidia-l4", accelerator_count: int = 1):
+        self.machine_type = machine_type
+        self.accelerator_type = accelerator_type
+        self.accelerator_count = accelerator_count if accelerator_type else 0
+
+    def __repr__(self):
+        if not self.accelerator_type:
+            return self.machine_type
+        return f"{self.machine_type} ({self.accelerator_count}x {self.accelerator_type})"
@@ -0,0 +1,40 @@
+import time
+from contextlib import contextmanager
+
+from ml_cloud_connector.tracing import span
+
+
+class MetricsHook:
+    def record_api_call(self, method: str, outcome: str, seconds: float):
+        pass
+
+    def observe_latency(self, name: str, seconds: float):
+        pass
+
+    def increment(self, name: str, amount: int = 1):
+        pass
+
+    def record_sleep(self, reason: str, seconds: float):
+        pass
+
+    @contextmanager
+    def api_call(self, method: str):
+        start = time.perf_counter()
+        outcome = "success"
+        try:
+            with span(method, kind="api_call"):
+                yield
+        except Exception as error:
+            outcome = type(error).__name__
+            raise
+        finally:
+            self.record_api_call(method, outcome, time.perf_counter() - start)
+
+    @contextmanager
+    def timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            with span(name):
+                yield
+        finally:
+            self.observe_latency(name, time.perf_counter() - start)
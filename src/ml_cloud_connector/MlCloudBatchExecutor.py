@@ -0,0 +1,74 @@
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable
+
+from ml_cloud_connector.Deadline import DEADLINE_MESSAGES, DeadlineExceeded, get_wait_timeout
+
+
+class MlCloudBatchExecutor:
+    def __init__(self, connector, max_workers: int = 8, max_resubmissions: int = 1):
+        self.connector = connector
+        self.max_workers = max_workers
+        self.max_resubmissions = max_resubmissions
+
+    @staticmethod
+    def get_call_arguments(arguments):
+        if isinstance(arguments, dict):
+            return (), arguments
+        if isinstance(arguments, tuple):
+            return arguments, {}
+        return (arguments,), {}
+
+    def execute(self, function: Callable, service_logger: logging.Logger, arguments):
+        args, kwargs = self.get_call_arguments(arguments)
+        result = self.connector.execute_on_cloud_server(function, service_logger, *args, **kwargs)
+        for _ in range(self.max_resubmissions):
+            if result[1] or result[2] in DEADLINE_MESSAGES:
+                break
+            try:
+                self.connector.circuit_breaker.wait_for_recovery(get_wait_timeout())
+            except DeadlineExceeded as e:
+                return None, False, str(e)
+            self.connector.metrics.increment("batch_resubmissions")
+            result = self.connector.execute_on_cloud_server(function, service_logger, *args, **kwargs)
+        return result
+
+    def map(self, function: Callable, argument_sets: Iterable, service_logger: logging.Logger, ordered: bool = True):
+        items = enumerate(argument_sets)
+        window = self.max_workers * 2
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        pending = {}
+        completed = {}
+        next_index = 0
+
+        def submit_next():
+            item = next(items, None)
+            if item is None:
+                return False
+            index, arguments = item
+            context = contextvars.copy_context()
+            pending[executor.submit(context.run, self.execute, function, service_logger, arguments)] = index
+            return True
+
+        try:
+            while len(pending) + len(completed) < window and submit_next():
+                pass
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    if ordered:
+                        completed[index] = future.result()
+                    else:
+                        yield index, future.result()
+
+                while next_index in completed:
+                    yield next_index, completed.pop(next_index)
+                    next_index += 1
+
+                while len(pending) + len(completed) < window and submit_next():
+                    pass
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -1,46 +1,105 @@
-import json
 import logging
+import os
+import socket
 import tempfile
+import threading
 import time
 import inspect
-from os import remove
 
-from google.api_core.exceptions import NotFound
-from requests.exceptions import ConnectionError
-from googleapiclient import discovery
-from httpx import ConnectTimeout, HTTPStatusError, ReadTimeout, RemoteProtocolError, ConnectError
 from pathlib import Path
 from typing import Callable
-from google.cloud import compute_v1
-from ml_cloud_connector.MlCloudDiskOperator import MlCloudDiskOperator
-from ml_cloud_connector.MlCloudInstanceOperator import MlCloudInstanceOperator
-from ml_cloud_connector.MlCloudSnapshotOperator import MlCloudSnapshotOperator
+from ml_cloud_connector import configuration
+from ml_cloud_connector.CircuitBreaker import get_circuit_breaker
+from ml_cloud_connector.Deadline import DeadlineExceeded, get_wait_timeout, run_shielded
+from ml_cloud_connector.MlCloudBatchExecutor import MlCloudBatchExecutor
+from ml_cloud_connector.InstanceState import InstanceState
+from ml_cloud_connector.MlCloudRetryState import (
+    GIVE_UP,
+    NO_RESPONSE_MESSAGE,
+    RECOVER,
+    REQUEST_RETRY_SECONDS,
+    RETRIES_EXHAUSTED_MESSAGE,
+    RETRY_REQUEST,
+    SWITCH_INSTANCE,
+    MlCloudRetryState,
+)
+from ml_cloud_connector.MlCloudStateStore import MlCloudStateStore
+from ml_cloud_connector.ReadinessCheck import get_readiness_check
 from ml_cloud_connector.ServerType import ServerType
-from ml_cloud_connector.configuration import PROJECT_ID
+from ml_cloud_connector.cloud_clients import get_compute, get_instances_client
+from ml_cloud_connector.SingleFlight import SingleFlight
+from ml_cloud_connector.metrics import get_metrics, sleep
+from ml_cloud_connector.server_profiles import get_host_server_type
+from ml_cloud_connector.tracing import record_span, span
+
+PROVISIONING_LEASE = "PROVISIONING"
+POWER_LEASE = "POWER"
+CIRCUIT_OPEN_MESSAGE = "Cloud server is recovering. Request rejected by the circuit breaker."
+KEEPALIVE_METADATA_KEY = "keepalive-until"
+BOOT_TIMINGS_NAMESPACE = "boot-timings"
 
 
 class MlCloudConnector:
 
-    def __init__(self, server_type: ServerType, service_logger=None, zone=None, instance=None):
+    def __init__(
+        self,
+        server_type: ServerType,
+        service_logger=None,
+        zone=None,
+        instance=None,
+        instance_state_ttl=None,
+        readiness_check=None,
+        metrics=None,
+        circuit_breaker=None,
+        fail_fast=False,
+        slot=0,
+        recover_in_background=False,
+        avoided_zones=(),
+    ):
         self.client = None
         self.ip_address = None
+        self.instance_state = InstanceState(instance_state_ttl or configuration.INSTANCE_STATE_TTL)
         self.service_logger = service_logger
-        self.CLOUD_CACHE_PATH = self.get_cache_path(server_type)
-
-        if not PROJECT_ID:
-            return
-
-        self.client = compute_v1.InstancesClient()
-        self.project = PROJECT_ID
+        self.CLOUD_CACHE_PATH = self.get_cache_path(server_type, slot)
+        self.state_store = MlCloudStateStore(self.CLOUD_CACHE_PATH)
+        self.single_flight = SingleFlight()
+        self.readiness_check = readiness_check or get_readiness_check(server_type)
+        self.metrics = metrics or get_metrics()
+        self.circuit_breaker = circuit_breaker or get_circuit_breaker(get_host_server_type(server_type), slot)
+        self.fail_fast = fail_fast
+        self.slot = slot
+        self.recover_in_background = recover_in_background
+        self.avoided_zones = avoided_zones
+        self.keepalive_until = 0
+        self.boot_pending = False
         self.server_type = server_type
+        self.host_server_type = get_host_server_type(server_type)
         self.zone = zone
         self.instance = instance
+
+        if not configuration.PROJECT_ID:
+            return
+
+        self.client = get_instances_client()
+        self.project = configuration.PROJECT_ID
         self.initialize_connector()
+        self.start_standby_disk_pool()
 
     @staticmethod
-    def get_cache_path(server_type: ServerType):
+    def get_cache_path(server_type: ServerType, slot=0):
+        server_type = get_host_server_type(server_type)
+        if slot:
+            return Path(tempfile.gettempdir(), f"{server_type}_{slot}_cloud_cache.json")
         return Path(tempfile.gettempdir(), f"{server_type}_cloud_cache.json")
 
+    def start_standby_disk_pool(self):
+        if not configuration.STANDBY_DISKS_PER_ZONE:
+            return None
+
+        from ml_cloud_connector.MlCloudStandbyDiskPool import get_standby_disk_pool
+
+        return get_standby_disk_pool(self.project, self.service_logger, self.host_server_type).start()
+
     def initialize_connector(self):
         if not self.service_logger:
             handlers = [logging.StreamHandler()]
@@ -49,13 +108,10 @@ class MlCloudConnector:
             self.service_logger = logging.getLogger()
 
         if self.zone and self.instance:
-            self.CLOUD_CACHE_PATH.write_text(json.dumps({"ZONE": self.zone, "INSTANCE": self.instance}))
+            self.state_store.replace({"ZONE": self.zone, "INSTANCE": self.instance})
             return
 
-        if self.CLOUD_CACHE_PATH.exists():
-            cache_content = json.loads(self.CLOUD_CACHE_PATH.read_text())
-            self.zone = cache_content["ZONE"]
-            self.instance = cache_content["INSTANCE"]
+        if self.load_instance_from_store():
             return
 
         self.service_logger.info("No cache found. Creating new instance.")
@@ -63,132 +119,539 @@ class MlCloudConnector:
         while not switched:
             switched = self.switch_to_new_instance()
 
+    def get_instance_info(self):
+        with self.metrics.api_call("instances.get"):
+            return self.client.get(project=self.project, zone=self.zone, instance=self.instance)
+
+    def request_start(self):
+        with self.metrics.api_call("instances.start"):
+            return self.client.start(project=self.project, zone=self.zone, instance=self.instance)
+
+    def request_stop(self):
+        with self.metrics.api_call("instances.stop"):
+            return self.client.stop(project=self.project, zone=self.zone, instance=self.instance)
+
     def is_active(self):
-        instance_info = self.client.get(project=self.project, zone=self.zone, instance=self.instance)
+        instance_info = self.get_instance_info()
+        self.instance_state.update(instance_info)
+        self.publish_instance_state()
         if instance_info.status == "RUNNING":
             self.service_logger.info("Instance is active")
             return True
         return False
 
+    def load_instance_from_store(self):
+        state = self.state_store.read()
+        if not state.get("ZONE") or not state.get("INSTANCE"):
+            return False
+
+        if (state["ZONE"], state["INSTANCE"]) != (self.zone, self.instance):
+            self.zone = state["ZONE"]
+            self.instance = state["INSTANCE"]
+            self.ip_address = None
+            self.instance_state.invalidate()
+
+        if state.get("LAST_VERIFIED"):
+            self.instance_state.load(state.get("STATUS"), state.get("IP"), state["LAST_VERIFIED"], state.get("READY", False))
+        return True
+
+    def publish_instance_state(self):
+        if not self.instance:
+            return
+        self.state_store.update_for_instance(
+            self.instance,
+            STATUS=self.instance_state.status,
+            IP=self.instance_state.ip_address,
+            LAST_VERIFIED=self.instance_state.last_verified,
+            READY=self.instance_state.ready,
+        )
+
+    def invalidate_instance_state(self):
+        self.instance_state.invalidate()
+        self.publish_instance_state()
+
+    def wait_for_other_process(self, lease_name):
+        self.service_logger.info(f"Another process holds the {lease_name} lease. Waiting for it to finish...")
+        self.state_store.wait_for_lease_release(lease_name)
+        self.load_instance_from_store()
+
+    def get_lease_owner(self):
+        return f"{socket.gethostname()}-{os.getpid()}-{id(self)}-{threading.get_ident()}"
+
     def start_attempt_with_instance_switch(self):
+        return self.single_flight.run("start_attempt_with_instance_switch", self.start_instance_with_switch)
+
+    def start_instance_with_switch(self):
         while not self.start():
-            switched = self.switch_to_new_instance()
+            switched = run_shielded(self.switch_to_new_instance)
             if switched:
+                self.metrics.increment("instance_switches")
                 self.stop()
-                time.sleep(120)
+                sleep(120, "instance_switch", self.metrics)
             else:
                 wait_time = 300
+                self.metrics.increment("instance_switch_failures")
                 self.service_logger.info("Switching to new instance failed on all available zones.")
                 self.service_logger.info(f"The process will be restarted after {wait_time} seconds.")
-                time.sleep(wait_time)
+                sleep(wait_time, "instance_switch_failure", self.metrics)
 
     def start(self):
-        if self.is_active():
-            return True
+        return self.single_flight.run("start", self.start_instance)
+
+    def start_instance(self):
+        with self.metrics.timed("start"):
+            return self.start_instance_with_lease()
+
+    def start_instance_with_lease(self):
+        while True:
+            if self.is_active():
+                return True
 
-        self.client.start(project=self.project, zone=self.zone, instance=self.instance)
+            if self.state_store.acquire_lease(POWER_LEASE, self.get_lease_owner(), configuration.POWER_LEASE_SECONDS):
+                try:
+                    return self.start_and_wait()
+                finally:
+                    self.state_store.release_lease(POWER_LEASE, self.get_lease_owner())
+
+            self.wait_for_other_process(POWER_LEASE)
+            if self.instance_state.is_fresh() and self.instance_state.status == "RUNNING":
+                return True
+
+    def start_and_wait(self):
+        self.request_start()
+        self.boot_pending = True
 
         for i in range(100):
             if self.is_active():
                 return True
-            time.sleep(5)
-            self.client.start(project=self.project, zone=self.zone, instance=self.instance)
+            sleep(5, "power_poll", self.metrics)
+            self.request_start()
         return False
 
     def stop(self):
-        if not self.is_active():
-            self.service_logger.info("Already stopped")
-            return True
+        return self.single_flight.run("stop", self.stop_instance)
+
+    def stop_instance(self):
+        with self.metrics.timed("stop"):
+            return self.stop_instance_with_lease()
+
+    def stop_instance_with_lease(self):
+        while True:
+            if not self.is_active():
+                self.service_logger.info("Already stopped")
+                return True
+
+            if self.state_store.acquire_lease(POWER_LEASE, self.get_lease_owner(), configuration.POWER_LEASE_SECONDS):
+                try:
+                    return self.stop_and_wait()
+                finally:
+                    self.state_store.release_lease(POWER_LEASE, self.get_lease_owner())
 
-        self.client.stop(project=self.project, zone=self.zone, instance=self.instance)
+            self.wait_for_other_process(POWER_LEASE)
+            if self.instance_state.is_fresh() and self.instance_state.status == "TERMINATED":
+                self.service_logger.info("Already stopped")
+                return True
+
+    def stop_and_wait(self):
+        self.request_stop()
 
         for i in range(100):
             if not self.is_active():
                 self.service_logger.info("stopped")
                 return True
-            time.sleep(5)
-            self.client.stop(project=self.project, zone=self.zone, instance=self.instance)
+            sleep(5, "power_poll", self.metrics)
+            self.request_stop()
         return False
 
     def restart(self):
+        return self.single_flight.run("restart", self.restart_instance)
+
+    def restart_instance(self):
         if not self.stop():
             return False
         return self.start()
 
+    def set_keepalive_metadata(self, keepalive_until):
+        from googleapiclient.errors import HttpError
+
+        compute = get_compute()
+        instances = compute.instances()
+        for attempt in range(3):
+            with self.metrics.api_call("instances.get"):
+                instance = instances.get(project=self.project, zone=self.zone, instance=self.instance).execute()
+            metadata = instance.get("metadata", {})
+            items = [item for item in metadata.get("items", []) if item["key"] != KEEPALIVE_METADATA_KEY]
+            current = [item for item in metadata.get("items", []) if item["key"] == KEEPALIVE_METADATA_KEY]
+            if keepalive_until and current and float(current[0]["value"]) >= keepalive_until:
+                return float(current[0]["value"])
+
+            if keepalive_until:
+                items.append({"key": KEEPALIVE_METADATA_KEY, "value": str(int(keepalive_until))})
+            body = {"fingerprint": metadata.get("fingerprint"), "items": items}
+            try:
+                with self.metrics.api_call("instances.setMetadata"):
+                    instances.setMetadata(project=self.project, zone=self.zone, instance=self.instance, body=body).execute()
+                return keepalive_until
+            except HttpError as e:
+                if e.resp.status != 412 or attempt == 2:
+                    raise
+                self.service_logger.info("Instance metadata changed while setting the keepalive lease. Retrying...")
+
+    def keep_alive(self, seconds):
+        if not self.client:
+            return 0
+        self.keepalive_until = self.set_keepalive_metadata(time.time() + seconds)
+        self.service_logger.info(f"Instance kept alive until {time.ctime(self.keepalive_until)}")
+        return self.keepalive_until
+
+    def release_keep_alive(self):
+        if not self.client:
+            return
+        self.set_keepalive_metadata(0)
+        self.keepalive_until = 0
+
+    def keep_alive_in_background(self, seconds):
+        def keep_alive():
+            try:
+                self.single_flight.run("keep_alive", self.keep_alive, seconds)
+            except Exception as e:
+                self.service_logger.warning(f"Keepalive lease not extended: {e}")
+
+        thread = threading.Thread(target=keep_alive, daemon=True)
+        thread.start()
+        return thread
+
+    def extend_keep_alive_for_traffic(self):
+        seconds = configuration.KEEPALIVE_TRAFFIC_SECONDS
+        if not seconds or not self.client or self.single_flight.is_running("keep_alive"):
+            return
+        if self.keepalive_until - time.time() > seconds / 2:
+            return
+        self.keep_alive_in_background(seconds)
+
+    def prewarm(self, keepalive_seconds=0):
+        def warm():
+            try:
+                if keepalive_seconds:
+                    self.single_flight.run("keep_alive", self.keep_alive, keepalive_seconds)
+                self.get_ip()
+            except Exception as e:
+                self.service_logger.warning(f"Prewarm failed: {e}")
+
+        thread = threading.Thread(target=warm, daemon=True)
+        thread.start()
+        return thread
+
+    def get_boot_timings(self):
+        if not self.client:
+            return {}
+
+        compute = get_compute()
+        with self.metrics.api_call("instances.getGuestAttributes"):
+            guest_attributes = (
+                compute.instances()
+                .getGuestAttributes(
+                    project=self.project, zone=self.zone, instance=self.instance, queryPath=f"{BOOT_TIMINGS_NAMESPACE}/"
+                )
+                .execute()
+            )
+
+        items = guest_attributes.get("queryValue", {}).get("items", [])
+        return {item["key"]: int(item["value"]) / 1000 for item in items}
+
+    def record_boot_timings(self):
+        self.boot_pending = False
+        try:
+            boot_timings = self.get_boot_timings()
+        except Exception as e:
+            self.service_logger.info(f"Boot timings not available: {e}")
+            return
+        for step, seconds in boot_timings.items():
+            record_span(f"post_start.{step}", seconds, kind="boot")
+
     def is_gpu_available(self):
-        instance_info = self.client.get(project=self.project, zone=self.zone, instance=self.instance)
+        if self.instance_state.is_fresh() and self.instance_state.guest_accelerators is not None:
+            return True if self.instance_state.guest_accelerators else False
+        instance_info = self.get_instance_info()
         return True if instance_info.guest_accelerators else False
 
     def get_ip(self):
         if not self.client:
             return "localhost"
 
-        self.start_attempt_with_instance_switch()
+        fresh_ip = self.get_fresh_ip()
+        if fresh_ip:
+            self.metrics.increment("instance_state_hits")
+            return fresh_ip
+
+        self.metrics.increment("instance_state_misses")
+        with span("get_ip", kind="request", server_type=self.server_type.value, slot=self.slot) as traced_span:
+            self.start_attempt_with_instance_switch()
+            ip_address = self.get_started_instance_ip()
+            if self.wait_until_ready(ip_address) and traced_span and self.boot_pending:
+                self.record_boot_timings()
+        return ip_address
+
+    def get_fresh_ip(self):
+        fresh_ip = self.instance_state.get_fresh_ip()
+        if not fresh_ip and self.load_instance_from_store():
+            fresh_ip = self.instance_state.get_fresh_ip()
+
+        if fresh_ip:
+            self.ip_address = fresh_ip
+        return fresh_ip
+
+    def get_started_instance_ip(self):
+        if self.instance_state.ip_address:
+            self.ip_address = self.instance_state.ip_address
 
         if self.ip_address:
             return self.ip_address
 
-        instance_info = self.client.get(project=self.project, zone=self.zone, instance=self.instance)
-        self.ip_address = instance_info.network_interfaces[0].access_configs[0].nat_i_p
-        return instance_info.network_interfaces[0].access_configs[0].nat_i_p
+        instance_info = self.get_instance_info()
+        self.instance_state.update(instance_info)
+        self.ip_address = self.instance_state.ip_address
+        return self.ip_address
+
+    def is_service_ready(self, ip_address):
+        return not self.readiness_check or self.readiness_check.is_ready(ip_address)
+
+    def mark_service_ready(self, ip_address):
+        if self.instance_state.ip_address == ip_address:
+            self.instance_state.ready = True
+            self.publish_instance_state()
+
+    def wait_until_ready(self, ip_address, timeout=None):
+        with self.metrics.timed("readiness"):
+            return self.wait_until_service_ready(ip_address, timeout)
+
+    def wait_until_service_ready(self, ip_address, timeout=None):
+        timeout = timeout or configuration.READINESS_TIMEOUT
+        deadline = time.time() + timeout
+        probe_interval = 0.25
+        while not self.is_service_ready(ip_address):
+            if time.time() + probe_interval > deadline:
+                self.service_logger.warning(f"Service on {ip_address} not ready after {timeout} seconds")
+                return False
+            sleep(probe_interval, "readiness_probe", self.metrics)
+            probe_interval = min(probe_interval * 1.5, 5)
+
+        self.mark_service_ready(ip_address)
+        return True
+
+    def wait_for_service_if_booting(self):
+        if not self.readiness_check or not self.is_active():
+            return False
+
+        ip_address = self.get_started_instance_ip()
+        if self.is_service_ready(ip_address):
+            return False
+
+        self.service_logger.info("Instance is running but the service is still booting. Waiting for it...")
+        return self.wait_until_ready(ip_address)
+
+    def get_api_calls_saved(self):
+        return self.instance_state.api_calls_saved
+
+    def is_request_allowed(self, service_logger: logging.Logger):
+        if self.circuit_breaker.allow_request():
+            return True
+        if self.fail_fast:
+            self.metrics.increment("circuit_breaker_rejections")
+            return False
+        service_logger.info("Cloud server is recovering. Waiting for the circuit breaker...")
+        while not self.circuit_breaker.allow_request():
+            self.circuit_breaker.wait_for_recovery(get_wait_timeout())
+        return True
+
+    def handle_cloud_error(self, error: Exception, retry_state: MlCloudRetryState):
+        action = retry_state.record_error(error)
+        self.invalidate_instance_state()
+        if action == RETRY_REQUEST:
+            sleep(REQUEST_RETRY_SECONDS, "request_retry", self.metrics)
+        elif action == RECOVER and self.recover_in_background:
+            threading.Thread(target=self.run_recovery, daemon=True).start()
+        elif action == RECOVER:
+            run_shielded(self.run_recovery)
+        elif action == SWITCH_INSTANCE:
+            self.forget_cloud_instance(self.server_type, self.slot)
+        return RETRIES_EXHAUSTED_MESSAGE if action == GIVE_UP else ""
+
+    @staticmethod
+    def bind_arguments(function: Callable, *args, **kwargs):
+        try:
+            bound_args = inspect.signature(function).bind(*args, **kwargs)
+        except TypeError as e:
+            raise Exception(f"Error in executing the function: {str(e)}")
+        bound_args.apply_defaults()
+        return bound_args
 
     def execute_on_cloud_server(
         self, function: Callable, service_logger: logging.Logger, *args, **kwargs
     ) -> (object, bool, str):
-        connection_wait_time = 0
-        reconnect_trial_count = 0
-        request_trial_count = 0
-        while reconnect_trial_count < 10:
+        bound_args = self.bind_arguments(function, *args, **kwargs)
+        self.extend_keep_alive_for_traffic()
+
+        retry_state = MlCloudRetryState(self, service_logger)
+        try:
+            while retry_state.has_attempts_left():
+                if not self.is_request_allowed(service_logger):
+                    return None, False, CIRCUIT_OPEN_MESSAGE
+
+                try:
+                    return_value = function(*bound_args.args, **bound_args.kwargs)
+                    self.circuit_breaker.record_success()
+                    return return_value, True, ""
+                except DeadlineExceeded:
+                    self.circuit_breaker.release_probe()
+                    raise
+                except Exception as e:
+                    error_message = self.handle_cloud_error(e, retry_state)
+                    if error_message:
+                        return None, False, error_message
+        except DeadlineExceeded as e:
+            self.metrics.increment("deadline_exceeded")
+            return None, False, str(e)
+        return None, False, NO_RESPONSE_MESSAGE
+
+    def execute_stream_on_cloud_server(
+        self,
+        function: Callable,
+        service_logger: logging.Logger,
+        args: tuple = (),
+        kwargs: dict = None,
+        resume: Callable = None,
+        on_restart: Callable = None,
+    ):
+        self.extend_keep_alive_for_traffic()
+        received_chunks = []
+        received_count = 0
+        start_time = time.perf_counter()
+        retry_state = MlCloudRetryState(self, service_logger)
+        while retry_state.has_attempts_left():
+            if not self.is_request_allowed(service_logger):
+                raise Exception(CIRCUIT_OPEN_MESSAGE)
+
             try:
-                bound_args = inspect.signature(function).bind(*args, **kwargs)
-                bound_args.apply_defaults()
-                return_value = function(*bound_args.args, **bound_args.kwargs)
-                return return_value, True, ""
-
-            except (ConnectError, ReadTimeout) as e:
-                if request_trial_count == 20:
-                    return None, False, "There is a problem with getting the response."
-                service_logger.warning(f"{str(e)} Retrying in 30 seconds.. [Trial: {request_trial_count + 1}]")
-                time.sleep(30)
-                request_trial_count += 1
-
-            except (ConnectionError, ConnectTimeout, HTTPStatusError, RemoteProtocolError, KeyError) as e:
-                service_logger.error(f"{str(e)} Retrying... [Trial: {reconnect_trial_count + 1}]")
-                self.stop()
-                time.sleep(connection_wait_time)
-                connection_wait_time = connection_wait_time * 1.5 if connection_wait_time else 150
-                if connection_wait_time > 900:
-                    connection_wait_time = 900
-                self.start_attempt_with_instance_switch()
-                time.sleep(30)
-                reconnect_trial_count += 1
-            except NotFound:
-                self.service_logger.info("Instance not found. Switching to new instance.")
-                self.forget_cloud_instance(self.server_type)
+                if received_count and resume:
+                    position = received_count
+                    chunks = resume(list(received_chunks))
+                else:
+                    if received_count and on_restart:
+                        on_restart()
+                        received_chunks, received_count = [], 0
+                    position = 0
+                    chunks = function(*args, **(kwargs or {}))
+
+                for chunk in chunks:
+                    position += 1
+                    if position <= received_count:
+                        continue
+                    if not received_count:
+                        self.metrics.observe_latency("time_to_first_chunk", time.perf_counter() - start_time)
+                    if resume:
+                        received_chunks.append(chunk)
+                    received_count += 1
+                    yield chunk
+
+                self.circuit_breaker.record_success()
+                return
+            except GeneratorExit:
+                if received_count:
+                    self.circuit_breaker.record_success()
+                else:
+                    self.circuit_breaker.release_probe()
+                raise
+            except DeadlineExceeded:
+                self.circuit_breaker.release_probe()
+                self.metrics.increment("deadline_exceeded")
+                raise
             except Exception as e:
-                raise Exception(f"Error in executing the function: {str(e)}")
-        return None, False, "Response not returned. Server error."
+                if received_count:
+                    self.metrics.increment("stream_interruptions")
+                error_message = self.handle_cloud_error(e, retry_state)
+                if error_message:
+                    raise Exception(error_message)
+        raise Exception(NO_RESPONSE_MESSAGE)
+
+    def execute_batch_on_cloud_server(
+        self, function: Callable, service_logger: logging.Logger, argument_sets, max_workers=8, ordered=True
+    ):
+        return MlCloudBatchExecutor(self, max_workers).map(function, argument_sets, service_logger, ordered)
+
+    def run_recovery(self):
+        try:
+            self.metrics.increment("circuit_breaker_recoveries")
+            self.recover_cloud_server()
+        except Exception as e:
+            self.service_logger.error(f"Cloud server recovery failed: {e}")
+        finally:
+            self.circuit_breaker.finish_recovery()
+
+    def recover_cloud_server(self):
+        if self.wait_for_service_if_booting():
+            return
+        self.stop()
+        sleep(self.circuit_breaker.connection_wait_time, "reconnect_backoff", self.metrics)
+        self.circuit_breaker.connection_wait_time = self.get_next_connection_wait_time(
+            self.circuit_breaker.connection_wait_time
+        )
+        self.start_attempt_with_instance_switch()
+        sleep(30, "reconnect", self.metrics)
+
+    @staticmethod
+    def get_next_connection_wait_time(connection_wait_time):
+        connection_wait_time = connection_wait_time * 1.5 if connection_wait_time else 150
+        return min(connection_wait_time, 900)
 
     def set_new_instance_features(self, instance_id, zone):
         self.instance = instance_id
         self.zone = zone
-        self.CLOUD_CACHE_PATH.write_text(json.dumps({"INSTANCE": instance_id, "ZONE": zone}))
+        self.state_store.replace({"INSTANCE": instance_id, "ZONE": zone})
         self.ip_address = None
+        self.instance_state.invalidate()
 
     def switch_to_new_instance(self):
-        compute = discovery.build("compute", "v1")
-        instance_operator = MlCloudInstanceOperator(self.project, self.service_logger, self.server_type)
-        instance_id, zone = instance_operator.create_instance_from_snapshot(compute)
+        previous_instance = self.instance
+        lease_owner = self.get_lease_owner()
+        if not self.state_store.acquire_lease(PROVISIONING_LEASE, lease_owner, configuration.PROVISIONING_LEASE_SECONDS):
+            self.wait_for_other_process(PROVISIONING_LEASE)
+            return self.instance is not None and self.instance != previous_instance
+
+        try:
+            if self.load_instance_from_store() and self.instance != previous_instance:
+                self.service_logger.info(f"Reusing instance {self.instance} provisioned by another process.")
+                return True
+            return self.provision_new_instance()
+        finally:
+            self.state_store.release_lease(PROVISIONING_LEASE, lease_owner)
+
+    def provision_new_instance(self):
+        from ml_cloud_connector.MlCloudInstanceOperator import MlCloudInstanceOperator
+
+        compute = get_compute()
+        instance_operator = MlCloudInstanceOperator(
+            self.project, self.service_logger, self.host_server_type, self.metrics, self.get_resource_suffix()
+        )
+        with self.metrics.timed("provisioning"):
+            instance_id, zone = instance_operator.create_instance_from_snapshot(compute, avoided_zones=self.avoided_zones)
         if not instance_id:
             return False
         self.set_new_instance_features(instance_id, zone)
         return True
 
+    def get_resource_suffix(self):
+        return f"-{self.slot}" if self.slot else ""
+
     def switch_to_new_instance_with_base_instance(self):
-        compute = discovery.build("compute", "v1")
-        disk_operator = MlCloudDiskOperator(self.project, self.service_logger)
-        snapshot_operator = MlCloudSnapshotOperator(self.project, self.service_logger, self.server_type)
-        instance_operator = MlCloudInstanceOperator(self.project, self.service_logger, self.server_type)
+        from ml_cloud_connector.MlCloudDiskOperator import MlCloudDiskOperator
+        from ml_cloud_connector.MlCloudInstanceOperator import MlCloudInstanceOperator
+        from ml_cloud_connector.MlCloudSnapshotOperator import MlCloudSnapshotOperator
+
+        compute = get_compute()
+        disk_operator = MlCloudDiskOperator(self.project, self.service_logger, self.metrics)
+        snapshot_operator = MlCloudSnapshotOperator(self.project, self.service_logger, self.host_server_type, self.metrics)
+        instance_operator = MlCloudInstanceOperator(self.project, self.service_logger, self.host_server_type, self.metrics)
         self.stop()
         base_instance = instance_operator.get_instance_configuration(compute, self.project, self.zone, self.instance)
         boot_disk = disk_operator.get_boot_disk(base_instance)
@@ -200,10 +663,8 @@ class MlCloudConnector:
         return True
 
     @staticmethod
-    def forget_cloud_instance(server_type: ServerType):
-        cache_path = MlCloudConnector.get_cache_path(server_type)
-        if cache_path.exists():
-            remove(cache_path)
+    def forget_cloud_instance(server_type: ServerType, slot=0):
+        MlCloudStateStore(MlCloudConnector.get_cache_path(server_type, slot)).clear()
 
 
 if __name__ == "__main__":
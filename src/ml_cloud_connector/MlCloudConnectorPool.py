@@ -0,0 +1,244 @@
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+from ml_cloud_connector import configuration
+from ml_cloud_connector.CircuitBreaker import CLOSED, OPEN
+from ml_cloud_connector.Deadline import DeadlineExceeded, get_wait_timeout
+from ml_cloud_connector.MlCloudBatchExecutor import MlCloudBatchExecutor
+from ml_cloud_connector.MlCloudConnector import MlCloudConnector, CIRCUIT_OPEN_MESSAGE
+from ml_cloud_connector.ServerType import ServerType
+from ml_cloud_connector.metrics import get_metrics
+
+routed_connector: ContextVar[MlCloudConnector] = ContextVar("routed_connector", default=None)
+
+
+class MlCloudConnectorPool:
+    def __init__(
+        self,
+        server_type: ServerType,
+        service_logger=None,
+        min_instances=None,
+        max_instances=None,
+        readiness_check=None,
+        metrics=None,
+        scale_out_in_flight=None,
+        scale_out_latency=None,
+        scale_in_idle_seconds=None,
+    ):
+        self.server_type = server_type
+        self.service_logger = service_logger
+        self.readiness_check = readiness_check
+        self.metrics = metrics or get_metrics()
+        self.min_instances = max(min_instances or configuration.POOL_MIN_INSTANCES, 1)
+        self.max_instances = max(max_instances or configuration.POOL_MAX_INSTANCES, self.min_instances)
+        self.scale_out_in_flight = scale_out_in_flight or configuration.POOL_SCALE_OUT_IN_FLIGHT
+        self.scale_out_latency = scale_out_latency or configuration.POOL_SCALE_OUT_LATENCY
+        self.scale_in_idle_seconds = scale_in_idle_seconds or configuration.POOL_SCALE_IN_IDLE_SECONDS
+        self.members: dict[int, MlCloudConnector] = {}
+        self.active_slots = set()
+        self.scaling_slots = set()
+        self.in_flight = Counter()
+        self.latencies: dict[int, float] = {}
+        self.last_used: dict[int, float] = {}
+        self.lock = threading.Lock()
+        self.member_creation_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.autoscaler = None
+
+        self.get_member(0)
+        self.service_logger = self.service_logger or self.members[0].service_logger
+        self.active_slots.add(0)
+        self.last_used[0] = time.time()
+        for _ in range(1, self.min_instances):
+            self.scale_out()
+
+    def get_member(self, slot, avoided_zones=()):
+        if slot not in self.members:
+            self.members[slot] = MlCloudConnector(
+                self.server_type,
+                self.service_logger,
+                readiness_check=self.readiness_check,
+                metrics=self.metrics,
+                fail_fast=True,
+                slot=slot,
+                recover_in_background=True,
+                avoided_zones=avoided_zones,
+            )
+        return self.members[slot]
+
+    def is_routable(self, slot):
+        member = self.members[slot]
+        state = member.instance_state
+        return member.circuit_breaker.state == CLOSED and state.is_fresh() and state.status == "RUNNING" and state.ready
+
+    def choose_slot(self):
+        slots = sorted(self.active_slots)
+        candidates = [slot for slot in slots if self.is_routable(slot)]
+        candidates = candidates or [slot for slot in slots if self.members[slot].circuit_breaker.state != OPEN] or slots
+        return min(candidates, key=lambda slot: (self.in_flight[slot], self.latencies.get(slot, 0)))
+
+    @contextmanager
+    def route(self):
+        with self.lock:
+            slot = self.choose_slot()
+            self.in_flight[slot] += 1
+            self.last_used[slot] = time.time()
+        token = routed_connector.set(self.members[slot])
+        start_time = time.perf_counter()
+        try:
+            yield self.members[slot]
+        finally:
+            routed_connector.reset(token)
+            latency = time.perf_counter() - start_time
+            with self.lock:
+                self.in_flight[slot] -= 1
+                self.last_used[slot] = time.time()
+                previous_latency = self.latencies.get(slot)
+                self.latencies[slot] = latency if previous_latency is None else 0.8 * previous_latency + 0.2 * latency
+
+    def get_ip(self):
+        member = routed_connector.get()
+        if member and member.circuit_breaker.state == OPEN:
+            from httpx import ConnectTimeout
+
+            raise ConnectTimeout(f"Pool instance {member.slot} is recovering")
+        if member:
+            return member.get_ip()
+        with self.lock:
+            member = self.members[self.choose_slot()]
+        return member.get_ip()
+
+    def execute_on_cloud_server(
+        self, function: Callable, service_logger: logging.Logger, *args, **kwargs
+    ) -> (object, bool, str):
+        rejected_member = None
+        while True:
+            with self.route() as member:
+                if member is rejected_member:
+                    try:
+                        member.circuit_breaker.wait_for_recovery(get_wait_timeout())
+                    except DeadlineExceeded as e:
+                        return None, False, str(e)
+                result = member.execute_on_cloud_server(function, service_logger, *args, **kwargs)
+            if result[2] != CIRCUIT_OPEN_MESSAGE:
+                return result
+            self.metrics.increment("pool_reroutes")
+            rejected_member = member
+
+    def execute_batch_on_cloud_server(
+        self, function: Callable, service_logger: logging.Logger, argument_sets, max_workers=8, ordered=True
+    ):
+        return MlCloudBatchExecutor(self, max_workers, max_resubmissions=0).map(
+            function, argument_sets, service_logger, ordered
+        )
+
+    def get_avoided_zones(self, slot):
+        return tuple(
+            member.zone for member_slot, member in list(self.members.items()) if member_slot != slot and member.zone
+        )
+
+    def scale_out(self):
+        with self.lock:
+            busy_slots = self.active_slots | self.scaling_slots
+            if len(busy_slots) >= self.max_instances:
+                return None
+            slot = min(set(range(self.max_instances)) - busy_slots)
+            self.scaling_slots.add(slot)
+
+        def start_member():
+            try:
+                with self.member_creation_lock:
+                    avoided_zones = self.get_avoided_zones(slot)
+                    member = self.get_member(slot, avoided_zones)
+                    member.avoided_zones = avoided_zones
+                member.get_ip()
+                with self.lock:
+                    self.active_slots.add(slot)
+                    self.last_used[slot] = time.time()
+                self.metrics.increment("pool_scale_out")
+                self.service_logger.info(f"Pool scaled out to {len(self.active_slots)} instances")
+            except Exception as e:
+                self.service_logger.error(f"Pool instance {slot} could not be started: {e}")
+            finally:
+                with self.lock:
+                    self.scaling_slots.discard(slot)
+
+        thread = threading.Thread(target=start_member, daemon=True)
+        thread.start()
+        return thread
+
+    def scale_in(self, slot):
+        with self.lock:
+            if slot not in self.active_slots or self.in_flight[slot] or len(self.active_slots) <= self.min_instances:
+                return None
+            self.active_slots.discard(slot)
+            self.latencies.pop(slot, None)
+
+        def stop_member():
+            try:
+                self.members[slot].stop()
+                self.metrics.increment("pool_scale_in")
+                self.service_logger.info(f"Pool scaled in to {len(self.active_slots)} instances")
+            except Exception as e:
+                self.service_logger.error(f"Pool instance {slot} could not be stopped: {e}")
+
+        thread = threading.Thread(target=stop_member, daemon=True)
+        thread.start()
+        return thread
+
+    def should_scale_out(self):
+        with self.lock:
+            routable_slots = [slot for slot in self.active_slots if self.is_routable(slot)]
+            in_flight = sum(self.in_flight[slot] for slot in self.active_slots)
+            latency = max((self.latencies.get(slot, 0) for slot in routable_slots), default=0)
+        if in_flight / max(len(routable_slots), 1) >= self.scale_out_in_flight:
+            return True
+        return bool(self.scale_out_latency) and latency >= self.scale_out_latency
+
+    def get_idle_slots(self, now):
+        with self.lock:
+            return sorted(
+                (
+                    slot
+                    for slot in self.active_slots
+                    if not self.in_flight[slot] and now - self.last_used.get(slot, now) >= self.scale_in_idle_seconds
+                ),
+                reverse=True,
+            )
+
+    def autoscale(self, now=None):
+        if not self.members[0].client:
+            return None
+        if self.should_scale_out():
+            return self.scale_out()
+        for slot in self.get_idle_slots(now or time.time()):
+            thread = self.scale_in(slot)
+            if thread:
+                return thread
+        return None
+
+    def run(self, check_interval):
+        while not self.stopped.wait(check_interval):
+            try:
+                self.autoscale()
+            except Exception as e:
+                self.service_logger.error(f"Pool autoscaling failed: {e}")
+
+    def start(self, check_interval=None):
+        if self.autoscaler and self.autoscaler.is_alive():
+            return self
+        self.stopped.clear()
+        check_interval = check_interval or configuration.POOL_CHECK_INTERVAL
+        self.autoscaler = threading.Thread(target=self.run, args=(check_interval,), daemon=True)
+        self.autoscaler.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.autoscaler:
+            self.autoscaler.join()
@@ -1,19 +1,26 @@
-import time
 from google.api_core.exceptions import BadRequest
-from google.cloud import compute_v1
 from googleapiclient.errors import HttpError
 
+from ml_cloud_connector.MlCloudDiskReaper import get_disk_reaper
+from ml_cloud_connector.cloud_clients import get_disks_client
+from ml_cloud_connector.metrics import get_metrics, sleep
+from ml_cloud_connector.tracing import span
 from ml_cloud_connector.wait_for_operation import wait_for_operation
 
+DISK_DELETE_ATTEMPTS = 5
+DISK_DETACH_RETRY_SECONDS = 10
+
 
 class MlCloudDiskOperator:
-    def __init__(self, project, service_logger):
+    def __init__(self, project, service_logger, metrics=None):
         self.project = project
         self.service_logger = service_logger
+        self.metrics = metrics or get_metrics()
 
     def disk_exists(self, compute, zone, disk_name):
         try:
-            disk = compute.disks().get(project=self.project, zone=zone, disk=disk_name).execute()
+            with self.metrics.api_call("disks.get"):
+                disk = compute.disks().get(project=self.project, zone=zone, disk=disk_name).execute()
             if disk:
                 self.service_logger.info(f"Disk '{disk_name}' already exists in zone '{zone}'.")
                 return True
@@ -26,31 +33,78 @@ class MlCloudDiskOperator:
                 raise
         return False
 
-    def create_disk_from_snapshot(self, compute, target_zone, new_disk_name, snapshot_name):
-        self.service_logger.info(f"Creating new disk: {new_disk_name} in zone {target_zone} from snapshot {snapshot_name}")
+    def get_source_image_path(self, source_image):
+        return source_image if "/" in source_image else f"projects/{self.project}/global/images/{source_image}"
+
+    def get_disk_type(self, zone):
+        return f"projects/{self.project}/zones/{zone}/diskTypes/pd-ssd"
+
+    def create_disk_from_snapshot(self, compute, target_zone, new_disk_name, snapshot_name, source_image="", labels=None):
         disk_body = {
             "name": new_disk_name,
-            "sourceSnapshot": f"projects/{self.project}/global/snapshots/{snapshot_name}",
-            "type": f"projects/{self.project}/zones/{target_zone}/diskTypes/pd-ssd",
+            "type": self.get_disk_type(target_zone),
+            "labels": labels or {},
         }
-        operation = compute.disks().insert(project=self.project, zone=target_zone, body=disk_body).execute()
-        wait_for_operation(self.project, compute, operation, self.service_logger)
+        if source_image:
+            self.service_logger.info(f"Creating new disk: {new_disk_name} in zone {target_zone} from image {source_image}")
+            disk_body["sourceImage"] = self.get_source_image_path(source_image)
+        else:
+            self.service_logger.info(
+                f"Creating new disk: {new_disk_name} in zone {target_zone} from snapshot {snapshot_name}"
+            )
+            disk_body["sourceSnapshot"] = f"projects/{self.project}/global/snapshots/{snapshot_name}"
+        with self.metrics.timed("create_disk_from_snapshot"):
+            with self.metrics.api_call("disks.insert"):
+                operation = compute.disks().insert(project=self.project, zone=target_zone, body=disk_body).execute()
+            wait_for_operation(self.project, compute, operation, self.service_logger, self.metrics)
 
-    def delete_disk(self, zone, disk_name):
+    def delete_disk(self, zone, disk_name, max_attempts=DISK_DELETE_ATTEMPTS):
         self.service_logger.info(f"Deleting disk: {disk_name} in zone {zone}")
-        try:
-            time.sleep(10)
-            disks_client = compute_v1.DisksClient()
-            operation = disks_client.delete(project=self.project, zone=zone, disk=disk_name)
-            operation.result()
-        except BadRequest as e:
-            self.service_logger.info(f"Disk deletion [{disk_name}] failed: {e}")
-
-    def prepare_disk(self, compute, zone, disk_name, snapshot_name):
-        if not self.disk_exists(compute, zone, disk_name):
-            self.create_disk_from_snapshot(compute, zone, disk_name, snapshot_name)
-        else:
-            self.service_logger.info(f"Using existing disk: {disk_name}")
+        with span("delete_disk", zone=zone):
+            for attempt in range(max_attempts):
+                try:
+                    disks_client = get_disks_client()
+                    with self.metrics.api_call("disks.delete"):
+                        operation = disks_client.delete(project=self.project, zone=zone, disk=disk_name)
+                        operation.result()
+                    return True
+                except BadRequest as e:
+                    if attempt == max_attempts - 1:
+                        self.service_logger.info(f"Disk deletion [{disk_name}] failed: {e}")
+                        return False
+                    self.service_logger.info(f"Disk {disk_name} is still attached. Retrying deletion...")
+                    sleep(DISK_DETACH_RETRY_SECONDS, "disk_detach", self.metrics)
+        return False
+
+    def delete_disk_in_background(self, zone, disk_name):
+        return get_disk_reaper().reap(self, zone, disk_name)
+
+    def prepare_disk(self, compute, zone, disk_name, snapshot_name, source_image=""):
+        with span("prepare_disk", zone=zone):
+            if not self.disk_exists(compute, zone, disk_name):
+                self.create_disk_from_snapshot(compute, zone, disk_name, snapshot_name, source_image)
+            else:
+                self.service_logger.info(f"Using existing disk: {disk_name}")
+
+    def get_attached_boot_disk(self, zone, disk_name):
+        return {
+            "boot": True,
+            "autoDelete": True,
+            "source": f"projects/{self.project}/zones/{zone}/disks/{disk_name}",
+            "deviceName": disk_name,
+        }
+
+    def get_initialized_boot_disk(self, zone, disk_name, source_image):
+        return {
+            "boot": True,
+            "autoDelete": True,
+            "deviceName": disk_name,
+            "initializeParams": {
+                "diskName": disk_name,
+                "sourceImage": self.get_source_image_path(source_image),
+                "diskType": self.get_disk_type(zone),
+            },
+        }
 
     @staticmethod
     def get_boot_disk(instance):
@@ -0,0 +1,47 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class MlCloudDiskReaper:
+    def __init__(self, max_workers: int = 4):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="disk-reaper")
+        self.lock = threading.Lock()
+        self.pending = set()
+
+    def reap(self, disk_operator, zone, disk_name):
+        with self.lock:
+            if (zone, disk_name) in self.pending:
+                return None
+            self.pending.add((zone, disk_name))
+        disk_operator.metrics.increment("disks_reaped")
+        return self.executor.submit(self.delete_disk, disk_operator, zone, disk_name)
+
+    def reap_expired(self, disk_operator, zone, claimed_at_by_disk: dict[str, float], grace_period: float):
+        expired_before = time.time() - grace_period
+        expired_disks = [disk_name for disk_name, claimed_at in claimed_at_by_disk.items() if claimed_at < expired_before]
+        return [self.reap(disk_operator, zone, disk_name) for disk_name in expired_disks]
+
+    def delete_disk(self, disk_operator, zone, disk_name):
+        try:
+            disk_operator.delete_disk(zone, disk_name)
+        except Exception as e:
+            disk_operator.service_logger.info(f"Disk deletion [{disk_name}] failed: {e}")
+        finally:
+            with self.lock:
+                self.pending.discard((zone, disk_name))
+
+    def get_pending_disks(self):
+        with self.lock:
+            return sorted(self.pending)
+
+
+disk_reapers: dict[str, MlCloudDiskReaper] = {}
+disk_reapers_lock = threading.Lock()
+
+
+def get_disk_reaper() -> MlCloudDiskReaper:
+    with disk_reapers_lock:
+        if "default" not in disk_reapers:
+            disk_reapers["default"] = MlCloudDiskReaper()
+        return disk_reapers["default"]
@@ -1,48 +1,81 @@
+import contextvars
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import socket
 
 from google.api_core.exceptions import GoogleAPICallError
 from googleapiclient.errors import HttpError
+from ml_cloud_connector.MachineConfiguration import MachineConfiguration
 from ml_cloud_connector.MlCloudDiskOperator import MlCloudDiskOperator
+from ml_cloud_connector.MlCloudStandbyDiskPool import MlCloudStandbyDiskPool
 from ml_cloud_connector.ServerType import ServerType
-from ml_cloud_connector.configuration import GOOGLE_CLOUD_INSTANCE_CONFIGURATION
-from ml_cloud_connector.wait_for_operation import wait_for_operation
+from ml_cloud_connector.cloud_clients import get_compute
+from ml_cloud_connector.metrics import get_metrics, sleep
+from ml_cloud_connector.ZoneCapabilityIndex import ZoneCapabilityIndex
+from ml_cloud_connector.server_profiles import get_server_profile
+from ml_cloud_connector.tracing import set_span_status, span
+from ml_cloud_connector.configuration import (
+    GOOGLE_CLOUD_INSTANCE_CONFIGURATION,
+    HEDGED_PROVISIONING_FAN_OUT,
+    INSTANCE_RUNNING_TIMEOUT,
+)
+from ml_cloud_connector.wait_for_operation import wait_for_operation, wait_for_operations
 
 
 class MlCloudInstanceOperator:
-    def __init__(self, project, service_logger, server_type: ServerType):
+    def __init__(self, project, service_logger, server_type: ServerType, metrics=None, resource_suffix=""):
         self.project = project
+        self.resource_suffix = resource_suffix
         self.service_logger = service_logger
         self.server_type = server_type
+        self.server_profile = get_server_profile(server_type)
+        self.metrics = metrics or get_metrics()
+        self.zone_index = ZoneCapabilityIndex(project, service_logger, metrics=self.metrics)
+        self.standby_disk_pool = MlCloudStandbyDiskPool(project, service_logger, server_type, self.metrics)
 
     def create_instance(
         self,
         compute,
         target_zone,
-        new_disk_name,
+        boot_disk,
         new_instance_name="",
-        accelerator_type="nvidia-l4",
-        machine_type="g2-standard-4",
-        accelerator_count=1,
+        machine_configuration: MachineConfiguration = None,
+        max_retries=3,
     ):
-        config = self.get_google_cloud_configuration(new_disk_name, new_instance_name, target_zone, machine_type)
+        machine_configuration = machine_configuration or self.server_profile.machine_configurations[0]
+        config = self.get_google_cloud_configuration(
+            boot_disk, new_instance_name, target_zone, machine_configuration.machine_type
+        )
 
-        if accelerator_type and accelerator_count > 0:
+        if machine_configuration.accelerator_type and machine_configuration.accelerator_count > 0:
+            accelerator_type = machine_configuration.accelerator_type
             config["guestAccelerators"] = [
                 {
                     "acceleratorType": f"projects/{self.project}/zones/{target_zone}/acceleratorTypes/{accelerator_type}",
-                    "acceleratorCount": accelerator_count,
+                    "acceleratorCount": machine_configuration.accelerator_count,
                 }
             ]
 
-        max_retries = 3
         delay = 60
 
+        with self.metrics.timed("create_instance"):
+            self.insert_instance(compute, target_zone, config, max_retries, delay)
+
+        with self.metrics.api_call("instances.get"):
+            new_instance = (
+                compute.instances().get(project=self.project, zone=target_zone, instance=new_instance_name).execute()
+            )
+        return new_instance
+
+    def insert_instance(self, compute, target_zone, config, max_retries, delay):
         for attempt in range(max_retries):
             try:
-                operation = compute.instances().insert(project=self.project, zone=target_zone, body=config).execute()
-                wait_for_operation(self.project, compute, operation, self.service_logger)
+                with self.metrics.api_call("instances.insert"):
+                    operation = compute.instances().insert(project=self.project, zone=target_zone, body=config).execute()
+                wait_for_operation(self.project, compute, operation, self.service_logger, self.metrics)
                 break
 
             except GoogleAPICallError as e:
@@ -50,91 +83,245 @@ class MlCloudInstanceOperator:
                     self.service_logger.info(
                         f"Resources not available. Retrying in {delay} seconds... [Trial: {attempt + 1}]"
                     )
-                    time.sleep(delay)
+                    self.metrics.increment("instance_insert_retries")
+                    sleep(delay, "instance_insert_retry", self.metrics)
                 else:
                     self.service_logger.info(f"Max retries [{max_retries}] reached. Trying other zones...")
                     raise
 
-        new_instance = compute.instances().get(project=self.project, zone=target_zone, instance=new_instance_name).execute()
-        return new_instance
+    def get_machine_image_path(self, machine_image):
+        return machine_image if "/" in machine_image else f"projects/{self.project}/global/machineImages/{machine_image}"
 
-    def get_google_cloud_configuration(self, new_disk_name, new_instance_name, target_zone, machine_type):
+    def get_google_cloud_configuration(self, boot_disk, new_instance_name, target_zone, machine_type):
         if not new_instance_name:
             current_time = datetime.now().strftime("%Y%m%d-%H%M%S")
             new_instance_name = f"instance-{socket.gethostname()}-{current_time}"
 
         self.service_logger.info(f"Creating new instance: {new_instance_name} in zone {target_zone}")
         machine_type_full = f"projects/{self.project}/zones/{target_zone}/machineTypes/{machine_type}"
+        region = target_zone.rsplit("-", 1)[0]
+        network_interfaces = [
+            {**interface, "subnetwork": re.sub(r"/regions/[^/]+/", f"/regions/{region}/", interface["subnetwork"])}
+            for interface in GOOGLE_CLOUD_INSTANCE_CONFIGURATION["networkInterfaces"]
+        ]
 
-        return {
+        config = {
             "name": new_instance_name,
             "machineType": machine_type_full,
-            "disks": [
-                {
-                    "boot": True,
-                    "autoDelete": True,
-                    "source": f"projects/{self.project}/zones/{target_zone}/disks/{new_disk_name}",
-                    "deviceName": new_disk_name,
-                }
-            ],
             **GOOGLE_CLOUD_INSTANCE_CONFIGURATION,
+            "networkInterfaces": network_interfaces,
         }
+        if self.server_profile.machine_image:
+            config["sourceMachineImage"] = self.get_machine_image_path(self.server_profile.machine_image)
+        else:
+            config["disks"] = [boot_disk]
+        return config
+
+    def request_instance_deletion(self, compute, zone, instance_name):
+        self.service_logger.info(f"Deleting instance: {instance_name} in zone {zone}")
+        try:
+            with self.metrics.api_call("instances.delete"):
+                return compute.instances().delete(project=self.project, zone=zone, instance=instance_name).execute()
+        except HttpError as e:
+            self.service_logger.info(f"Instance deletion [{instance_name}] failed: {e}")
+            return None
+
+    def delete_instance(self, compute, zone, instance_name):
+        operation = self.request_instance_deletion(compute, zone, instance_name)
+        if not operation:
+            return
+        try:
+            wait_for_operation(self.project, compute, operation, self.service_logger, self.metrics)
+        except (GoogleAPICallError, HttpError) as e:
+            self.service_logger.info(f"Instance deletion [{instance_name}] failed: {e}")
+
+    def wait_for_instance_running(self, compute, zone, instance_name, timeout=INSTANCE_RUNNING_TIMEOUT):
+        deadline = time.time() + timeout
+        with span("instance_boot", zone=zone):
+            while time.time() < deadline:
+                with self.metrics.api_call("instances.get"):
+                    instance = compute.instances().get(project=self.project, zone=zone, instance=instance_name).execute()
+                if instance["status"] == "RUNNING":
+                    return instance
+                if instance["status"] in ("STOPPING", "SUSPENDED", "TERMINATED"):
+                    break
+                sleep(2, "instance_running_poll", self.metrics)
+        raise GoogleAPICallError(f"Instance {instance_name} in zone {zone} did not reach RUNNING")
 
     @staticmethod
     def get_instance_configuration(compute, project, zone, instance):
         return compute.instances().get(project=project, zone=zone, instance=instance).execute()
 
-    def is_zone_available(self, accelerator_type, compute, machine_type, zone_name):
-        accelerator_types = compute.acceleratorTypes().list(project=self.project, zone=zone_name).execute()
-        has_accelerator = any(acc["name"] == accelerator_type for acc in accelerator_types.get("items", []))
-        machine_types = compute.machineTypes().list(project=self.project, zone=zone_name).execute()
-        has_machine_type = any(mt["name"] == machine_type for mt in machine_types.get("items", []))
-        return has_accelerator and has_machine_type
-
-    def get_zones_with_accelerator(self, compute, accelerator_type="nvidia-l4", machine_type="g2-standard-4"):
-        zones_with_accelerator = []
-        zones_request = compute.zones().list(project=self.project)
+    def get_zones_with_accelerator(self, compute, machine_configuration: MachineConfiguration = None, regions=None):
+        machine_configuration = machine_configuration or self.server_profile.machine_configurations[0]
+        accelerator_type, machine_type = machine_configuration.accelerator_type, machine_configuration.machine_type
+        regions = regions or self.server_profile.get_regions()
         self.service_logger.info(f"\nGetting available zones for '{accelerator_type}' and '{machine_type}'...")
-
-        while zones_request is not None:
-            response = zones_request.execute()
-            for zone in response.get("items", []):
-                zone_name = zone["name"]
-                try:
-                    zone_available = self.is_zone_available(accelerator_type, compute, machine_type, zone_name)
-                    if zone_available:
-                        zones_with_accelerator.append(zone_name)
-                except HttpError as e:
-                    self.service_logger.info(f"Error checking accelerators in zone {zone_name}: {e}")
-            zones_request = compute.zones().list_next(previous_request=zones_request, previous_response=response)
+        try:
+            with self.metrics.timed("get_zones_with_accelerator"):
+                zones_with_accelerator = self.zone_index.get_zones(compute, accelerator_type, machine_type, regions)
+        except HttpError as e:
+            self.service_logger.info(f"Error getting zones with accelerator '{accelerator_type}': {e}")
+            zones_with_accelerator = []
 
         self.service_logger.info(f"Available zones for '{accelerator_type}' and '{machine_type}': {zones_with_accelerator}")
 
         return zones_with_accelerator
 
-    def create_instance_from_snapshot(self, compute):
-        snapshot_name = f"{self.server_type.value}-server-snapshot"
-        disk_operator = MlCloudDiskOperator(self.project, self.service_logger)
-        available_zones = self.get_zones_with_accelerator(compute)
-        target_zones = [zone for zone in available_zones if zone.startswith("europe-west4")]
+    def get_new_resource_names(self):
+        current_time = datetime.now().strftime("%Y%m%d-%H%M%S")
+        new_disk_name = f"{self.server_type.value}-disk-{socket.gethostname()}-{current_time}{self.resource_suffix}"
+        new_instance_name = f"{self.server_type.value}-instance-{socket.gethostname()}-{current_time}{self.resource_suffix}"
+        return new_disk_name, new_instance_name
+
+    def prepare_boot_disk(self, disk_operator, compute, target_zone, new_disk_name):
+        server_profile = self.server_profile
+        if server_profile.machine_image:
+            return None
+
+        standby_disk_name = self.standby_disk_pool.claim_disk(compute, target_zone)
+        if standby_disk_name:
+            return disk_operator.get_attached_boot_disk(target_zone, standby_disk_name)
+
+        if server_profile.source_image:
+            return disk_operator.get_initialized_boot_disk(target_zone, new_disk_name, server_profile.source_image)
+
+        disk_operator.prepare_disk(compute, target_zone, new_disk_name, server_profile.snapshot_name)
+        return disk_operator.get_attached_boot_disk(target_zone, new_disk_name)
+
+    @staticmethod
+    def release_boot_disk(disk_operator, target_zone, boot_disk):
+        if boot_disk and "source" in boot_disk:
+            disk_operator.delete_disk_in_background(target_zone, boot_disk["deviceName"])
+
+    def create_instance_from_snapshot(self, compute, fan_out=HEDGED_PROVISIONING_FAN_OUT, avoided_zones=()):
+        for machine_configuration in self.server_profile.machine_configurations:
+            with span("machine_configuration", machine_type=machine_configuration.machine_type) as traced_span:
+                instance_id, zone = self.create_instance_with_configuration(
+                    compute, machine_configuration, fan_out, avoided_zones
+                )
+                if not instance_id:
+                    set_span_status(traced_span, "failed")
+            if instance_id:
+                return instance_id, zone
+            self.service_logger.info(f"No zone could create a {machine_configuration} instance.")
+            self.metrics.increment("machine_configuration_fallbacks")
+        return None, None
+
+    def create_instance_with_configuration(self, compute, machine_configuration, fan_out, avoided_zones):
+        disk_operator = MlCloudDiskOperator(self.project, self.service_logger, self.metrics)
+        target_zones = sorted(
+            self.get_zones_with_accelerator(compute, machine_configuration), key=lambda zone: zone in avoided_zones
+        )
+
+        if fan_out > 1 and len(target_zones) > 1:
+            return self.create_instance_in_fastest_zone(machine_configuration, target_zones, fan_out)
 
         for target_zone in target_zones:
-            current_time = datetime.now().strftime("%Y%m%d-%H%M%S")
-            new_disk_name = f"{self.server_type.value}-disk-{socket.gethostname()}-{current_time}"
-            new_instance_name = f"{self.server_type.value}-instance-{socket.gethostname()}-{current_time}"
-            self.service_logger.info(f"\nAttempting to create instance in zone: {target_zone}")
-            disk_operator.prepare_disk(compute, target_zone, new_disk_name, snapshot_name)
-            try:
-                new_instance = self.create_instance(compute, target_zone, new_disk_name, new_instance_name)
-                self.service_logger.info(f"Instance created in zone {target_zone}.")
-                return new_instance["id"], target_zone
+            with span("zone_attempt", zone=target_zone) as traced_span:
+                new_instance = self.create_instance_in_zone(compute, disk_operator, machine_configuration, target_zone)
+                if new_instance:
+                    return new_instance["id"], target_zone
+                set_span_status(traced_span, "failed")
+        return None, None
 
-            except (GoogleAPICallError, HttpError) as err:
-                self.service_logger.info(f"An error occurred while creating the instance on {target_zone}: {err}")
-                disk_operator.delete_disk(target_zone, new_disk_name)
-                continue
+    def create_instance_in_zone(self, compute, disk_operator, machine_configuration, target_zone):
+        new_disk_name, new_instance_name = self.get_new_resource_names()
+        self.service_logger.info(f"\nAttempting to create instance in zone: {target_zone}")
+        boot_disk = self.prepare_boot_disk(disk_operator, compute, target_zone, new_disk_name)
+        try:
+            new_instance = self.create_instance(compute, target_zone, boot_disk, new_instance_name, machine_configuration)
+            self.service_logger.info(f"Instance created in zone {target_zone}.")
+            return new_instance
+
+        except (GoogleAPICallError, HttpError) as err:
+            self.service_logger.info(f"An error occurred while creating the instance on {target_zone}: {err}")
+            self.release_boot_disk(disk_operator, target_zone, boot_disk)
+            return None
+
+        except Exception as e:
+            self.service_logger.info(f"An unexpected error occurred: {e}")
+            raise
+
+    def create_instance_in_fastest_zone(self, machine_configuration, target_zones, fan_out):
+        self.service_logger.info(f"\nAttempting to create instance in zones {target_zones} with fan-out {fan_out}")
+        winner_found = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=fan_out)
+        futures = [
+            executor.submit(contextvars.copy_context().run, self.try_zone, machine_configuration, zone, winner_found)
+            for zone in target_zones
+        ]
+        winner = None
 
+        for future in as_completed(futures):
+            try:
+                winner = future.result()
             except Exception as e:
                 self.service_logger.info(f"An unexpected error occurred: {e}")
-                raise
-        return None, None
+            if winner:
+                winner_found.set()
+                break
+
+        executor.shutdown(wait=False, cancel_futures=True)
+        if not winner:
+            return None, None
+
+        self.service_logger.info(f"Instance created in zone {winner['zone']}.")
+        threading.Thread(target=self.tear_down_losers, args=(futures, winner), daemon=True).start()
+        return winner["instance"]["id"], winner["zone"]
+
+    def try_zone(self, machine_configuration, target_zone, winner_found: threading.Event):
+        with span("zone_attempt", zone=target_zone) as traced_span:
+            result = self.run_zone_attempt(machine_configuration, target_zone, winner_found)
+            if not result:
+                set_span_status(traced_span, "failed")
+            return result
+
+    def run_zone_attempt(self, machine_configuration, target_zone, winner_found: threading.Event):
+        if winner_found.is_set():
+            return None
+
+        compute = get_compute()
+        disk_operator = MlCloudDiskOperator(self.project, self.service_logger, self.metrics)
+        new_disk_name, new_instance_name = self.get_new_resource_names()
+        self.service_logger.info(f"Attempting to create instance in zone: {target_zone}")
+        boot_disk = self.prepare_boot_disk(disk_operator, compute, target_zone, new_disk_name)
+
+        if winner_found.is_set():
+            self.release_boot_disk(disk_operator, target_zone, boot_disk)
+            return None
+
+        try:
+            self.create_instance(compute, target_zone, boot_disk, new_instance_name, machine_configuration, max_retries=1)
+        except (GoogleAPICallError, HttpError) as err:
+            self.service_logger.info(f"An error occurred while creating the instance on {target_zone}: {err}")
+            self.release_boot_disk(disk_operator, target_zone, boot_disk)
+            return None
+
+        try:
+            new_instance = self.wait_for_instance_running(compute, target_zone, new_instance_name)
+            return {"instance": new_instance, "zone": target_zone}
+        except (GoogleAPICallError, HttpError) as err:
+            self.service_logger.info(f"Instance on {target_zone} did not start: {err}")
+            self.delete_instance(compute, target_zone, new_instance_name)
+            return None
+
+    def tear_down_losers(self, futures, winner):
+        compute = get_compute()
+        deletions = []
+        for future in futures:
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception:
+                continue
+            if result and result is not winner:
+                deletions.append(self.request_instance_deletion(compute, result["zone"], result["instance"]["name"]))
+
+        operations = [operation for operation in deletions if operation]
+        for operation, _, error in wait_for_operations(self.project, operations, self.service_logger, metrics=self.metrics):
+            if error:
+                self.service_logger.info(
+                    f"Instance deletion [{operation.get('targetLink', operation['name'])}] failed: {error}"
+                )
@@ -0,0 +1,180 @@
+import threading
+import time
+from datetime import datetime
+from typing import Callable
+
+from ml_cloud_connector import configuration
+from ml_cloud_connector.MlCloudConnector import POWER_LEASE
+from ml_cloud_connector.cloud_clients import get_compute
+from ml_cloud_connector.cloud_errors import get_not_found_error
+from ml_cloud_connector.metrics import sleep
+
+STATUS_CHANGED = "STATUS_CHANGED"
+IP_CHANGED = "IP_CHANGED"
+PREEMPTED = "PREEMPTED"
+DELETED = "DELETED"
+
+STOPPED_STATUSES = ("STOPPING", "SUSPENDING", "SUSPENDED", "TERMINATED")
+INVOLUNTARY_STOP_OPERATIONS = ("compute.instances.preempted", "compute.instances.hostError")
+
+
+class MlCloudInstanceWatcher:
+    def __init__(self, connector, interval: float = None, auto_recover: bool = True):
+        self.connector = connector
+        self.interval = interval or configuration.INSTANCE_WATCH_INTERVAL
+        self.auto_recover = auto_recover
+        self.subscribers: list[Callable] = []
+        self.subscribers_lock = threading.Lock()
+        self.watched_instance = None
+        self.status = None
+        self.ip_address = None
+        self.last_running_time = 0.0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def subscribe(self, callback: Callable):
+        with self.subscribers_lock:
+            self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: Callable):
+        with self.subscribers_lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def publish(self, event_type: str, **details):
+        event = {
+            "type": event_type,
+            "zone": self.connector.zone,
+            "instance": self.connector.instance,
+            "time": time.time(),
+            **details,
+        }
+        self.connector.service_logger.info(f"Instance {event['instance']} {event_type}: {details}")
+        self.connector.metrics.increment(f"watcher_{event_type.lower()}")
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                self.connector.service_logger.error(f"Instance watcher subscriber failed: {e}")
+
+    def poll(self):
+        connector = self.connector
+        if (connector.zone, connector.instance) != self.watched_instance:
+            self.watched_instance = (connector.zone, connector.instance)
+            self.status = None
+            self.ip_address = None
+
+        try:
+            instance_info = connector.get_instance_info()
+        except get_not_found_error():
+            connector.invalidate_instance_state()
+            self.publish(DELETED, previous_status=self.status)
+            self.watched_instance = None
+            if self.auto_recover:
+                self.recover(self.replace_instance)
+            return
+
+        connector.instance_state.update(instance_info)
+        connector.publish_instance_state()
+        previous_status, previous_ip_address = self.status, self.ip_address
+        self.status, self.ip_address = instance_info.status, connector.instance_state.ip_address
+
+        if self.status == "RUNNING":
+            self.last_running_time = time.time()
+            self.check_readiness()
+
+        if previous_status and self.status != previous_status:
+            self.publish(STATUS_CHANGED, previous_status=previous_status, status=self.status)
+            if previous_status == "RUNNING" and self.status in STOPPED_STATUSES:
+                self.handle_unexpected_stop()
+
+        if previous_ip_address and self.ip_address and self.ip_address != previous_ip_address:
+            connector.ip_address = self.ip_address
+            self.publish(IP_CHANGED, previous_ip_address=previous_ip_address, ip_address=self.ip_address)
+
+    def check_readiness(self):
+        state = self.connector.instance_state
+        if state.ip_address and not state.ready and self.connector.is_service_ready(state.ip_address):
+            self.connector.mark_service_ready(state.ip_address)
+
+    def handle_unexpected_stop(self):
+        if self.connector.single_flight.is_running("stop") or self.connector.state_store.is_lease_held(POWER_LEASE):
+            return
+
+        preempted = self.was_preempted()
+        if preempted:
+            self.publish(PREEMPTED, status=self.status)
+
+        kept_alive = self.connector.keepalive_until > time.time()
+        if self.auto_recover and (preempted or kept_alive):
+            self.recover(self.connector.recover_cloud_server)
+
+    def was_preempted(self):
+        connector = self.connector
+        operation_filter = " OR ".join(f'(operationType = "{operation}")' for operation in INVOLUNTARY_STOP_OPERATIONS)
+        with connector.metrics.api_call("zoneOperations.list"):
+            operations = (
+                get_compute()
+                .zoneOperations()
+                .list(project=connector.project, zone=connector.zone, filter=operation_filter)
+                .execute()
+            )
+
+        for operation in operations.get("items", []):
+            is_target = operation.get("targetId") == str(connector.instance) or operation.get("targetLink", "").endswith(
+                f"/instances/{connector.instance}"
+            )
+            inserted_at = datetime.fromisoformat(operation["insertTime"]).timestamp()
+            if is_target and inserted_at >= self.last_running_time - self.interval:
+                return True
+        return False
+
+    def recover(self, recovery: Callable):
+        circuit_breaker = self.connector.circuit_breaker
+        if not circuit_breaker.try_start_recovery():
+            return None
+
+        def run_recovery():
+            try:
+                self.connector.metrics.increment("watcher_recoveries")
+                recovery()
+            except Exception as e:
+                self.connector.service_logger.error(f"Instance watcher recovery failed: {e}")
+            finally:
+                circuit_breaker.finish_recovery()
+
+        thread = threading.Thread(target=run_recovery, daemon=True)
+        thread.start()
+        return thread
+
+    def replace_instance(self):
+        connector = self.connector
+        connector.forget_cloud_instance(connector.server_type, connector.slot)
+        while not connector.switch_to_new_instance():
+            connector.service_logger.info("Switching to new instance failed on all available zones.")
+            sleep(300, "instance_switch_failure", connector.metrics)
+        connector.get_ip()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                self.connector.service_logger.error(f"Instance watcher poll failed: {e}")
+            self.stopped.wait(self.interval)
+
+    def start(self):
+        if not self.connector.client or (self.thread and self.thread.is_alive()):
+            return self
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
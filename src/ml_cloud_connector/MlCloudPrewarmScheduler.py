@@ -0,0 +1,57 @@
+import threading
+from datetime import datetime, timedelta
+
+from ml_cloud_connector import configuration
+
+
+class MlCloudPrewarmScheduler:
+    def __init__(self, connector, schedule: list[tuple[int, int, float]] = None, lead_seconds: float = None):
+        self.connector = connector
+        self.schedule = schedule if schedule is not None else self.parse_schedule(configuration.PREWARM_SCHEDULE)
+        self.lead_seconds = lead_seconds if lead_seconds is not None else configuration.PREWARM_LEAD_SECONDS
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @staticmethod
+    def parse_schedule(schedule: str):
+        entries = []
+        for entry in schedule.split(","):
+            if not entry.strip():
+                continue
+            start_time, _, duration = entry.strip().partition("=")
+            hour, minute = start_time.split(":")
+            entries.append((int(hour), int(minute), float(duration or 3600)))
+        return entries
+
+    def get_next_prewarm(self, now: datetime):
+        candidates = []
+        for hour, minute, duration in self.schedule:
+            start = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            prewarm_at = start - timedelta(seconds=self.lead_seconds)
+            if prewarm_at <= now:
+                prewarm_at += timedelta(days=1)
+            candidates.append((prewarm_at, duration))
+        return min(candidates) if candidates else (None, 0)
+
+    def run(self):
+        while not self.stopped.is_set():
+            prewarm_at, duration = self.get_next_prewarm(datetime.now())
+            if not prewarm_at:
+                return
+            if self.stopped.wait((prewarm_at - datetime.now()).total_seconds()):
+                return
+            self.connector.service_logger.info(f"Scheduled prewarm for {self.lead_seconds + duration} seconds")
+            self.connector.prewarm(keepalive_seconds=self.lead_seconds + duration)
+
+    def start(self):
+        if not self.schedule or (self.thread and self.thread.is_alive()):
+            return self
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
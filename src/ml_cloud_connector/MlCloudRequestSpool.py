@@ -0,0 +1,295 @@
+import importlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+from ml_cloud_connector.Deadline import DEADLINE_EXCEEDED_MESSAGE, Deadline
+
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+DONE = "DONE"
+FAILED = "FAILED"
+EXPIRED = "EXPIRED"
+
+
+class MlCloudRequestSpool:
+    def __init__(self, connector, path: Path = None, max_concurrency: int = 4, claim_timeout: float = 900):
+        self.connector = connector
+        self.path = path or Path(tempfile.gettempdir(), f"{connector.server_type}_request_spool.sqlite3")
+        self.max_concurrency = max_concurrency
+        self.claim_timeout = claim_timeout
+        self.owner = uuid.uuid4().hex
+        self.slots = threading.Semaphore(max_concurrency)
+        self.work_available = threading.Event()
+        self.stopped = threading.Event()
+        self.futures: dict[str, Future] = {}
+        self.futures_lock = threading.Lock()
+        self.running_jobs: set[str] = set()
+        self.executor = None
+        self.dispatcher = None
+        self.heartbeat = None
+        self.create_table()
+
+    @property
+    def service_logger(self):
+        return self.connector.service_logger or logging.getLogger()
+
+    @contextmanager
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def create_table(self):
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, function TEXT, arguments TEXT, priority INTEGER, deadline REAL, status TEXT, "
+                "created_at REAL, claimed_at REAL, claimed_host TEXT, claimed_pid INTEGER, claimed_by TEXT, "
+                "result TEXT, error TEXT)"
+            )
+            columns = [column[1] for column in connection.execute("PRAGMA table_info(jobs)")]
+            if "claimed_by" not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN claimed_by TEXT")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at)")
+
+    @staticmethod
+    def get_function_path(function: Callable):
+        if "<" in function.__qualname__:
+            raise ValueError(f"Spooled functions must be importable, got {function.__qualname__}")
+        return f"{function.__module__}:{function.__qualname__}"
+
+    @staticmethod
+    def load_function(function_path: str):
+        module_name, qualified_name = function_path.split(":")
+        function = importlib.import_module(module_name)
+        for name in qualified_name.split("."):
+            function = getattr(function, name)
+        return function
+
+    def submit(self, function: Callable, args: tuple = (), kwargs: dict = None, priority: int = 0, deadline: float = None):
+        job_id = uuid.uuid4().hex
+        arguments = json.dumps({"args": list(args), "kwargs": kwargs or {}})
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, function, arguments, priority, deadline, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, self.get_function_path(function), arguments, priority, deadline, PENDING, time.time()),
+            )
+        self.get_future(job_id)
+        self.work_available.set()
+        return job_id
+
+    def get_future(self, job_id: str) -> Future:
+        with self.futures_lock:
+            if job_id not in self.futures:
+                self.futures[job_id] = Future()
+            return self.futures[job_id]
+
+    def get_job(self, job_id: str):
+        with self.connect() as connection:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_status(self, job_id: str):
+        job = self.get_job(job_id)
+        return job["status"] if job else None
+
+    def get_result(self, job_id: str, timeout: float = None, poll_interval: float = 1):
+        deadline = time.time() + timeout if timeout else None
+        while True:
+            job = self.get_job(job_id)
+            if job and job["status"] in (DONE, FAILED, EXPIRED):
+                return json.loads(job["result"]) if job["result"] else None, job["status"] == DONE, job["error"] or ""
+            if deadline and time.time() > deadline:
+                raise TimeoutError(f"Job {job_id} not finished after {timeout} seconds")
+            time.sleep(poll_interval)
+
+    def count_jobs(self, status: str = PENDING):
+        with self.connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def expire_jobs(self):
+        with self.connect() as connection:
+            rows = connection.execute(
+                "UPDATE jobs SET status = ?, error = ? "
+                "WHERE status = ? AND deadline IS NOT NULL AND deadline < ? RETURNING id",
+                (EXPIRED, "Deadline exceeded before the job could run.", PENDING, time.time()),
+            ).fetchall()
+
+        for (job_id,) in rows:
+            self.resolve_future(job_id, None, False, "Deadline exceeded before the job could run.")
+        if rows:
+            self.connector.metrics.increment("spool_jobs_expired", len(rows))
+
+    @staticmethod
+    def is_process_alive(pid: int):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def is_claim_stale(self, job_id: str, claimed_at: float, claimed_host: str, claimed_pid: int, claimed_by: str):
+        if claimed_by == self.owner:
+            with self.futures_lock:
+                return job_id not in self.running_jobs
+        if claimed_host == socket.gethostname() and not self.is_process_alive(claimed_pid):
+            return True
+        return claimed_at < time.time() - self.claim_timeout
+
+    def requeue_stale_jobs(self):
+        with self.connect() as connection:
+            claims = connection.execute(
+                "SELECT id, claimed_at, claimed_host, claimed_pid, claimed_by FROM jobs WHERE status = ?", (RUNNING,)
+            ).fetchall()
+            stale_jobs = [(claim[0],) for claim in claims if self.is_claim_stale(*claim)]
+            connection.executemany(
+                f"UPDATE jobs SET status = '{PENDING}', claimed_at = NULL WHERE id = ? AND status = '{RUNNING}'", stale_jobs
+            )
+        if stale_jobs:
+            self.service_logger.info(
+                f"Requeued {len(stale_jobs)} spooled jobs whose process stopped or whose claim was not renewed."
+            )
+
+    def refresh_claims(self):
+        with self.futures_lock:
+            job_ids = [(time.time(), job_id, self.owner) for job_id in self.running_jobs]
+        if not job_ids:
+            return
+        with self.connect() as connection:
+            connection.executemany(
+                f"UPDATE jobs SET claimed_at = ? WHERE id = ? AND claimed_by = ? AND status = '{RUNNING}'", job_ids
+            )
+
+    def send_heartbeats(self):
+        while not self.stopped.wait(self.claim_timeout / 3):
+            try:
+                self.refresh_claims()
+            except sqlite3.Error as e:
+                self.service_logger.warning(f"Could not renew spooled job claims: {e}")
+
+    def claim_job(self):
+        with self.connect() as connection:
+            connection.row_factory = sqlite3.Row
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE status = ? AND (deadline IS NULL OR deadline >= ?) "
+                "ORDER BY priority DESC, created_at LIMIT 1",
+                (PENDING, time.time()),
+            ).fetchone()
+            if row:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, claimed_at = ?, claimed_host = ?, claimed_pid = ?, claimed_by = ? "
+                    "WHERE id = ?",
+                    (RUNNING, time.time(), socket.gethostname(), os.getpid(), self.owner, row["id"]),
+                )
+            connection.execute("COMMIT")
+        if row:
+            with self.futures_lock:
+                self.running_jobs.add(row["id"])
+        return dict(row) if row else None
+
+    def finish_job(self, job_id: str, value, success: bool, error: str):
+        try:
+            result = json.dumps(value)
+        except (TypeError, ValueError):
+            result = None
+            error = error or "Result is not JSON serializable and was only delivered in-process."
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ? WHERE id = ?",
+                (self.get_finished_status(success, error), result, error, job_id),
+            )
+
+    @staticmethod
+    def get_finished_status(success: bool, error: str):
+        if success:
+            return DONE
+        return EXPIRED if error == DEADLINE_EXCEEDED_MESSAGE else FAILED
+
+    def resolve_future(self, job_id: str, value, success: bool, error: str):
+        with self.futures_lock:
+            future = self.futures.pop(job_id, None)
+        if future and not future.done():
+            future.set_result((value, success, error))
+
+    def run_job(self, job: dict):
+        try:
+            function = self.load_function(job["function"])
+            arguments = json.loads(job["arguments"])
+            with Deadline(job["deadline"] - time.time() if job["deadline"] else None):
+                value, success, error = self.connector.execute_on_cloud_server(
+                    function, self.service_logger, *arguments["args"], **arguments["kwargs"]
+                )
+        except Exception as e:
+            value, success, error = None, False, str(e)
+
+        try:
+            self.finish_job(job["id"], value, success, error)
+            self.resolve_future(job["id"], value, success, error)
+            self.connector.metrics.increment("spool_jobs_done" if success else "spool_jobs_failed")
+        finally:
+            with self.futures_lock:
+                self.running_jobs.discard(job["id"])
+            self.slots.release()
+
+    def dispatch(self):
+        while not self.stopped.is_set():
+            self.expire_jobs()
+            self.requeue_stale_jobs()
+            if not self.count_jobs(PENDING):
+                self.work_available.wait(1)
+                self.work_available.clear()
+                continue
+
+            try:
+                self.connector.get_ip()
+            except Exception as e:
+                self.service_logger.error(f"Cloud server not available for spooled jobs: {e}")
+                self.stopped.wait(30)
+                continue
+
+            while not self.stopped.is_set() and self.slots.acquire(timeout=1):
+                job = self.claim_job()
+                if not job:
+                    self.slots.release()
+                    break
+                self.executor.submit(self.run_job, job)
+
+    def start(self):
+        if self.dispatcher and self.dispatcher.is_alive():
+            return self
+        self.stopped.clear()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+        self.heartbeat = threading.Thread(target=self.send_heartbeats, daemon=True)
+        self.heartbeat.start()
+        return self
+
+    def stop(self, wait: bool = True):
+        self.stopped.set()
+        self.work_available.set()
+        if self.dispatcher:
+            self.dispatcher.join()
+        if self.heartbeat:
+            self.heartbeat.join()
+        if self.executor:
+            self.executor.shutdown(wait=wait)
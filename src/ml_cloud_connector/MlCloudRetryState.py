@@ -0,0 +1,59 @@
+import logging
+from collections import Counter
+
+from ml_cloud_connector.Deadline import spend_retry
+from ml_cloud_connector.cloud_errors import get_request_retry_errors, get_reconnect_errors, get_not_found_error
+
+RETRY_REQUEST = "RETRY_REQUEST"
+RECONNECT = "RECONNECT"
+RECOVER = "RECOVER"
+SWITCH_INSTANCE = "SWITCH_INSTANCE"
+GIVE_UP = "GIVE_UP"
+
+MAX_RECONNECTS = 10
+MAX_REQUEST_RETRIES = 20
+REQUEST_RETRY_SECONDS = 30
+RETRIES_EXHAUSTED_MESSAGE = "There is a problem with getting the response."
+NO_RESPONSE_MESSAGE = "Response not returned. Server error."
+
+
+class MlCloudRetryState:
+    def __init__(self, connector, service_logger: logging.Logger):
+        self.connector = connector
+        self.service_logger = service_logger
+        self.trials = Counter()
+
+    def has_attempts_left(self):
+        return self.trials["reconnect"] < MAX_RECONNECTS
+
+    def record_error(self, error: Exception) -> str:
+        circuit_breaker = self.connector.circuit_breaker
+        metrics = self.connector.metrics
+        if isinstance(error, get_request_retry_errors()):
+            circuit_breaker.record_failure()
+            metrics.increment("request_retries")
+            spend_retry()
+            if self.trials["request"] == MAX_REQUEST_RETRIES:
+                return GIVE_UP
+            self.service_logger.warning(
+                f"{str(error)} Retrying in {REQUEST_RETRY_SECONDS} seconds.. [Trial: {self.trials['request'] + 1}]"
+            )
+            self.trials["request"] += 1
+            return RETRY_REQUEST
+
+        if isinstance(error, get_reconnect_errors()):
+            self.service_logger.error(f"{str(error)} Retrying... [Trial: {self.trials['reconnect'] + 1}]")
+            circuit_breaker.record_failure()
+            metrics.increment("reconnects")
+            self.trials["reconnect"] += 1
+            spend_retry()
+            return RECOVER if circuit_breaker.try_start_recovery() else RECONNECT
+
+        if isinstance(error, get_not_found_error()):
+            self.connector.service_logger.info("Instance not found. Switching to new instance.")
+            circuit_breaker.release_probe()
+            metrics.increment("instances_not_found")
+            return SWITCH_INSTANCE
+
+        circuit_breaker.record_success()
+        raise Exception(f"Error in executing the function: {str(error)}")
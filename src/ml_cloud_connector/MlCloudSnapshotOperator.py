@@ -1,18 +1,23 @@
 from googleapiclient.errors import HttpError
 
 from ml_cloud_connector.ServerType import ServerType
+from ml_cloud_connector.metrics import get_metrics
+from ml_cloud_connector.server_profiles import get_server_profile
+from ml_cloud_connector.tracing import span
 from ml_cloud_connector.wait_for_operation import wait_for_operation
 
 
 class MlCloudSnapshotOperator:
-    def __init__(self, project, service_logger, server_type: ServerType):
+    def __init__(self, project, service_logger, server_type: ServerType, metrics=None):
         self.project = project
         self.service_logger = service_logger
         self.server_type = server_type
+        self.metrics = metrics or get_metrics()
 
     def snapshot_exists(self, compute, snapshot_name):
         try:
-            snapshot = compute.snapshots().get(project=self.project, snapshot=snapshot_name).execute()
+            with self.metrics.api_call("snapshots.get"):
+                snapshot = compute.snapshots().get(project=self.project, snapshot=snapshot_name).execute()
             if snapshot:
                 self.service_logger.info(f"Snapshot '{snapshot_name}' already exists.")
                 return True
@@ -30,14 +35,19 @@ class MlCloudSnapshotOperator:
         snapshot_body = {
             "name": snapshot_name,
         }
-        operation = (
-            compute.disks().createSnapshot(project=self.project, zone=zone, disk=boot_disk, body=snapshot_body).execute()
-        )
-        wait_for_operation(self.project, compute, operation, self.service_logger)
+        with self.metrics.api_call("disks.createSnapshot"):
+            operation = (
+                compute.disks().createSnapshot(project=self.project, zone=zone, disk=boot_disk, body=snapshot_body).execute()
+            )
+        wait_for_operation(self.project, compute, operation, self.service_logger, self.metrics)
 
     def prepare_snapshot(self, compute, zone, boot_disk_name):
-        snapshot_name = f"{self.server_type.value}-server-snapshot"
-        if not self.snapshot_exists(compute, snapshot_name):
-            self.create_snapshot(compute, zone, boot_disk_name, snapshot_name)
-        else:
-            self.service_logger.info(f"Using existing snapshot: {snapshot_name}")
+        snapshot_name = get_server_profile(self.server_type).snapshot_name
+        if not snapshot_name:
+            self.service_logger.info(f"No snapshot configured for {self.server_type.value}. Using its source image.")
+            return
+        with span("prepare_snapshot", snapshot=snapshot_name):
+            if not self.snapshot_exists(compute, snapshot_name):
+                self.create_snapshot(compute, zone, boot_disk_name, snapshot_name)
+            else:
+                self.service_logger.info(f"Using existing snapshot: {snapshot_name}")
@@ -0,0 +1,186 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from googleapiclient.errors import HttpError
+
+from ml_cloud_connector import configuration
+from ml_cloud_connector.MlCloudDiskOperator import MlCloudDiskOperator
+from ml_cloud_connector.MlCloudDiskReaper import get_disk_reaper
+from ml_cloud_connector.MlCloudStateStore import MlCloudStateStore
+from ml_cloud_connector.ServerType import ServerType
+from ml_cloud_connector.ZoneCapabilityIndex import ZoneCapabilityIndex
+from ml_cloud_connector.cloud_clients import get_compute
+from ml_cloud_connector.metrics import get_metrics
+from ml_cloud_connector.server_profiles import get_server_profile
+from ml_cloud_connector.tracing import span
+from ml_cloud_connector.wait_for_operation import wait_for_operation
+
+STANDBY_LABEL = "ml-cloud-connector-standby"
+STATE_LABEL = "ml-cloud-connector-state"
+CLAIMED_AT_LABEL = "ml-cloud-connector-claimed-at"
+READY = "ready"
+CLAIMED = "claimed"
+TOP_UP_LEASE = "STANDBY_TOP_UP"
+
+
+class MlCloudStandbyDiskPool:
+    def __init__(
+        self, project, service_logger, server_type: ServerType, metrics=None, disks_per_zone=None, check_interval=None
+    ):
+        self.project = project
+        self.service_logger = service_logger
+        self.server_type = server_type
+        self.server_profile = get_server_profile(server_type)
+        self.metrics = metrics or get_metrics()
+        self.disks_per_zone = configuration.STANDBY_DISKS_PER_ZONE if disks_per_zone is None else disks_per_zone
+        self.check_interval = check_interval or configuration.STANDBY_DISK_CHECK_INTERVAL
+        self.claim_grace_period = configuration.STANDBY_DISK_CLAIM_GRACE_PERIOD
+        self.disk_operator = MlCloudDiskOperator(project, service_logger, self.metrics)
+        self.zone_index = ZoneCapabilityIndex(project, service_logger, metrics=self.metrics)
+        self.state_store = MlCloudStateStore(Path(tempfile.gettempdir(), f"{server_type.value}_standby_disks.json"))
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def is_enabled(self):
+        return self.disks_per_zone > 0 and not self.server_profile.machine_image
+
+    def get_standby_disks(self, compute, zone, state=READY):
+        standby_filter = f'(labels.{STANDBY_LABEL} = "{self.server_type.value}") AND (labels.{STATE_LABEL} = "{state}")'
+        with self.metrics.api_call("disks.list"):
+            disks = compute.disks().list(project=self.project, zone=zone, filter=standby_filter).execute()
+        return [disk for disk in disks.get("items", []) if disk.get("status") == "READY" and not disk.get("users")]
+
+    def mark_claimed(self, compute, zone, disk):
+        labels = {**disk.get("labels", {}), STATE_LABEL: CLAIMED, CLAIMED_AT_LABEL: str(int(time.time()))}
+        body = {"labels": labels, "labelFingerprint": disk["labelFingerprint"]}
+        try:
+            with self.metrics.api_call("disks.setLabels"):
+                operation = (
+                    compute.disks().setLabels(project=self.project, zone=zone, resource=disk["name"], body=body).execute()
+                )
+            wait_for_operation(self.project, compute, operation, self.service_logger, self.metrics)
+        except HttpError as e:
+            self.service_logger.info(f"Standby disk {disk['name']} was claimed by another process: {e}")
+            return False
+        return True
+
+    def claim_disk(self, compute, zone):
+        if not self.is_enabled():
+            return None
+
+        with span("claim_standby_disk", zone=zone):
+            for disk in self.get_standby_disks(compute, zone):
+                if not self.mark_claimed(compute, zone, disk):
+                    continue
+
+                self.service_logger.info(f"Claimed standby disk {disk['name']} in zone {zone}")
+                self.metrics.increment("standby_disk_hits")
+                return disk["name"]
+
+        self.metrics.increment("standby_disk_misses")
+        return None
+
+    def get_zones(self, compute):
+        zones = set()
+        regions = self.server_profile.get_regions()
+        for machine_configuration in self.server_profile.machine_configurations:
+            accelerator_type, machine_type = machine_configuration.accelerator_type, machine_configuration.machine_type
+            zones.update(self.zone_index.get_zones(compute, accelerator_type, machine_type, regions))
+        return sorted(zones)
+
+    def create_standby_disk(self, zone):
+        disk_name = f"{self.server_type.value}-standby-{uuid.uuid4().hex[:12]}"
+        labels = {STANDBY_LABEL: self.server_type.value, STATE_LABEL: READY}
+        self.disk_operator.create_disk_from_snapshot(
+            get_compute(),
+            zone,
+            disk_name,
+            self.server_profile.snapshot_name,
+            self.server_profile.source_image,
+            labels,
+        )
+        self.metrics.increment("standby_disks_created")
+        return disk_name
+
+    def get_lease_owner(self):
+        return f"{socket.gethostname()}-{os.getpid()}-{id(self)}"
+
+    def remove_excess_disks(self, compute, zone, excess_disks):
+        for disk in excess_disks:
+            if self.mark_claimed(compute, zone, disk):
+                self.service_logger.info(f"Removing excess standby disk {disk['name']} in zone {zone}")
+                self.disk_operator.delete_disk_in_background(zone, disk["name"])
+                self.metrics.increment("standby_disks_removed")
+
+    def top_up(self):
+        if not self.is_enabled():
+            return []
+
+        lease_owner = self.get_lease_owner()
+        if not self.state_store.acquire_lease(TOP_UP_LEASE, lease_owner, configuration.PROVISIONING_LEASE_SECONDS):
+            return []
+
+        try:
+            return self.top_up_zones(get_compute())
+        finally:
+            self.state_store.release_lease(TOP_UP_LEASE, lease_owner)
+
+    def reap_abandoned_claims(self, compute, zone):
+        claimed_disks = self.get_standby_disks(compute, zone, CLAIMED)
+        claimed_at_by_disk = {disk["name"]: float(disk.get("labels", {}).get(CLAIMED_AT_LABEL, 0)) for disk in claimed_disks}
+        reaped = get_disk_reaper().reap_expired(self.disk_operator, zone, claimed_at_by_disk, self.claim_grace_period)
+        if reaped:
+            self.service_logger.info(f"Removing {len(reaped)} claimed standby disks never attached in zone {zone}")
+
+    def top_up_zones(self, compute):
+        missing_zones = []
+        for zone in self.get_zones(compute):
+            standby_disks = self.get_standby_disks(compute, zone)
+            missing_zones.extend([zone] * (self.disks_per_zone - len(standby_disks)))
+            self.remove_excess_disks(compute, zone, standby_disks[self.disks_per_zone :])
+            self.reap_abandoned_claims(compute, zone)
+
+        if not missing_zones:
+            return []
+
+        self.service_logger.info(f"Creating {len(missing_zones)} standby disks in zones {sorted(set(missing_zones))}")
+        with ThreadPoolExecutor(max_workers=min(len(missing_zones), 8)) as executor:
+            return list(executor.map(self.create_standby_disk, missing_zones))
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.top_up()
+            except Exception as e:
+                self.service_logger.error(f"Standby disk top-up failed: {e}")
+            self.stopped.wait(self.check_interval)
+
+    def start(self):
+        if not self.project or not self.is_enabled() or (self.thread and self.thread.is_alive()):
+            return self
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+
+standby_disk_pools: dict[ServerType, MlCloudStandbyDiskPool] = {}
+standby_disk_pools_lock = threading.Lock()
+
+
+def get_standby_disk_pool(project, service_logger, server_type: ServerType) -> MlCloudStandbyDiskPool:
+    with standby_disk_pools_lock:
+        if server_type not in standby_disk_pools:
+            standby_disk_pools[server_type] = MlCloudStandbyDiskPool(project, service_logger, server_type)
+        return standby_disk_pools[server_type]
@@ -0,0 +1,106 @@
+import fcntl
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from ml_cloud_connector.metrics import sleep
+
+
+class MlCloudStateStore:
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock_path = path.with_suffix(".lock")
+
+    @contextmanager
+    def locked(self):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_unlocked(self) -> dict:
+        try:
+            return json.loads(self.path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def write_unlocked(self, state: dict):
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+        try:
+            with os.fdopen(file_descriptor, "w") as temporary_file:
+                temporary_file.write(json.dumps(state))
+                temporary_file.flush()
+                os.fsync(temporary_file.fileno())
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+    def read(self) -> dict:
+        with self.locked():
+            return self.read_unlocked()
+
+    def update(self, **values) -> dict:
+        with self.locked():
+            state = self.read_unlocked()
+            state.update(values)
+            self.write_unlocked(state)
+            return state
+
+    def update_for_instance(self, instance, **values) -> bool:
+        with self.locked():
+            state = self.read_unlocked()
+            if state.get("INSTANCE") != instance:
+                return False
+            state.update(values)
+            self.write_unlocked(state)
+            return True
+
+    def replace(self, state: dict):
+        with self.locked():
+            leases = self.read_unlocked().get("LEASES", {})
+            self.write_unlocked({**state, "LEASES": leases})
+
+    def clear(self):
+        with self.locked():
+            leases = self.read_unlocked().get("LEASES", {})
+            if leases:
+                self.write_unlocked({"LEASES": leases})
+            elif self.path.exists():
+                os.remove(self.path)
+
+    def acquire_lease(self, lease_name: str, owner: str, duration: float) -> bool:
+        with self.locked():
+            state = self.read_unlocked()
+            leases = state.get("LEASES", {})
+            lease = leases.get(lease_name)
+            if lease and lease["OWNER"] != owner and lease["EXPIRES_AT"] > time.time():
+                return False
+            leases[lease_name] = {"OWNER": owner, "EXPIRES_AT": time.time() + duration}
+            state["LEASES"] = leases
+            self.write_unlocked(state)
+            return True
+
+    def release_lease(self, lease_name: str, owner: str):
+        with self.locked():
+            state = self.read_unlocked()
+            leases = state.get("LEASES", {})
+            if leases.get(lease_name, {}).get("OWNER") != owner:
+                return
+            del leases[lease_name]
+            state["LEASES"] = leases
+            self.write_unlocked(state)
+
+    def is_lease_held(self, lease_name: str) -> bool:
+        lease = self.read().get("LEASES", {}).get(lease_name)
+        return bool(lease) and lease["EXPIRES_AT"] > time.time()
+
+    def wait_for_lease_release(self, lease_name: str, poll_interval: float = 2):
+        while self.is_lease_held(lease_name):
+            sleep(poll_interval, "lease_wait")
@@ -0,0 +1,64 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ml_cloud_connector.InMemoryMetricsCollector import InMemoryMetricsCollector, Histogram
+
+
+class PrometheusMetricsExporter(InMemoryMetricsCollector):
+    @staticmethod
+    def format_labels(**labels):
+        return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+    def render_histogram(self, metric_name: str, histogram: Histogram, **labels):
+        lines = []
+        cumulative = 0
+        for upper_bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.bucket_counts):
+            cumulative += bucket_count
+            bound = "+Inf" if upper_bound == float("inf") else upper_bound
+            lines.append(f"{metric_name}_bucket{self.format_labels(**labels, le=bound)} {cumulative}")
+        lines.append(f"{metric_name}_sum{self.format_labels(**labels)} {histogram.sum}")
+        lines.append(f"{metric_name}_count{self.format_labels(**labels)} {histogram.count}")
+        return lines
+
+    def render(self):
+        with self.lock:
+            lines = ["# TYPE ml_cloud_api_calls_total counter"]
+            for (method, outcome), count in sorted(self.api_calls.items()):
+                lines.append(f"ml_cloud_api_calls_total{self.format_labels(method=method, outcome=outcome)} {count}")
+
+            lines.append("# TYPE ml_cloud_api_call_seconds histogram")
+            for method, histogram in sorted(self.api_call_latencies.items()):
+                lines.extend(self.render_histogram("ml_cloud_api_call_seconds", histogram, method=method))
+
+            lines.append("# TYPE ml_cloud_phase_seconds histogram")
+            for phase, histogram in sorted(self.latencies.items()):
+                lines.extend(self.render_histogram("ml_cloud_phase_seconds", histogram, phase=phase))
+
+            lines.append("# TYPE ml_cloud_events_total counter")
+            for event, count in sorted(self.counters.items()):
+                lines.append(f"ml_cloud_events_total{self.format_labels(event=event)} {count}")
+
+            lines.append("# TYPE ml_cloud_sleep_seconds_total counter")
+            for reason, seconds in sorted(self.sleep_seconds.items()):
+                lines.append(f"ml_cloud_sleep_seconds_total{self.format_labels(reason=reason)} {seconds}")
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "0.0.0.0"):
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
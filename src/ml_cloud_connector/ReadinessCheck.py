@@ -0,0 +1,56 @@
+import socket
+
+from ml_cloud_connector.ServerType import ServerType
+from ml_cloud_connector.server_profiles import get_host_server_type, get_hosted_server_types, get_server_profile
+
+
+class TcpReadinessCheck:
+    def __init__(self, port: int, timeout: float = 2):
+        self.port = port
+        self.timeout = timeout
+
+    def is_ready(self, ip_address: str) -> bool:
+        try:
+            with socket.create_connection((ip_address, self.port), timeout=self.timeout):
+                return True
+        except OSError:
+            return False
+
+
+class HttpReadinessCheck:
+    def __init__(self, port: int, path: str = "/", timeout: float = 2):
+        self.port = port
+        self.path = path
+        self.timeout = timeout
+
+    def is_ready(self, ip_address: str) -> bool:
+        import httpx
+
+        try:
+            response = httpx.get(f"http://{ip_address}:{self.port}{self.path}", timeout=self.timeout)
+        except httpx.HTTPError:
+            return False
+        return response.status_code < 500
+
+
+class AllReadinessCheck:
+    def __init__(self, readiness_checks: list):
+        self.readiness_checks = readiness_checks
+
+    def is_ready(self, ip_address: str) -> bool:
+        return all(readiness_check.is_ready(ip_address) for readiness_check in self.readiness_checks)
+
+
+def get_service_readiness_check(server_type: ServerType):
+    server_profile = get_server_profile(server_type)
+    if server_profile.readiness_path is None:
+        return TcpReadinessCheck(server_profile.service_port)
+    return HttpReadinessCheck(server_profile.service_port, server_profile.readiness_path)
+
+
+def get_readiness_check(server_type: ServerType):
+    hosted_server_types = get_hosted_server_types(get_host_server_type(server_type))
+    readiness_checks = [get_service_readiness_check(hosted_server_type) for hosted_server_type in hosted_server_types]
+    if len(readiness_checks) <= 1:
+        return readiness_checks[0] if readiness_checks else None
+    return AllReadinessCheck(readiness_checks)
@@ -0,0 +1,28 @@
+from ml_cloud_connector import configuration
+from ml_cloud_connector.MachineConfiguration import MachineConfiguration
+from ml_cloud_connector.ServerType import ServerType
+
+
+class ServerProfile:
+    def __init__(
+        self,
+        snapshot_name: str = "",
+        machine_configurations: list[MachineConfiguration] = None,
+        regions: list[str] = None,
+        source_image: str = "",
+        machine_image: str = "",
+        service_port: int = 11434,
+        readiness_path: str = "/",
+        shares_instance_with: ServerType = None,
+    ):
+        self.snapshot_name = snapshot_name
+        self.machine_configurations = machine_configurations or [MachineConfiguration()]
+        self.regions = regions
+        self.source_image = source_image
+        self.machine_image = machine_image
+        self.service_port = service_port
+        self.readiness_path = readiness_path
+        self.shares_instance_with = shares_instance_with
+
+    def get_regions(self):
+        return self.regions or configuration.TARGET_REGIONS
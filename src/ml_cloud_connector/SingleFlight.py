@@ -0,0 +1,49 @@
+import threading
+from typing import Callable
+
+from ml_cloud_connector.Deadline import DeadlineExceeded, check_deadline, wait_for_event
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights: dict[str, Flight] = {}
+
+    def run(self, key: str, function: Callable, *args, **kwargs):
+        with self.lock:
+            flight = self.flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = Flight()
+                self.flights[key] = flight
+
+        if not is_leader:
+            wait_for_event(flight.done)
+            if isinstance(flight.error, DeadlineExceeded):
+                check_deadline()
+                return self.run(key, function, *args, **kwargs)
+            if flight.error:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = function(*args, **kwargs)
+            return flight.result
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def is_running(self, key: str):
+        with self.lock:
+            return key in self.flights
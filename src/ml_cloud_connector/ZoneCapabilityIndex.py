@@ -0,0 +1,60 @@
+import tempfile
+import time
+from pathlib import Path
+
+from ml_cloud_connector.MlCloudStateStore import MlCloudStateStore
+from ml_cloud_connector.configuration import ZONE_INDEX_TTL
+from ml_cloud_connector.metrics import get_metrics
+
+
+class ZoneCapabilityIndex:
+    def __init__(self, project, service_logger, ttl=ZONE_INDEX_TTL, path: Path = None, metrics=None):
+        self.project = project
+        self.service_logger = service_logger
+        self.metrics = metrics or get_metrics()
+        self.ttl = ttl
+        self.state_store = MlCloudStateStore(path or Path(tempfile.gettempdir(), "zone_capability_index.json"))
+
+    @staticmethod
+    def get_key(accelerator_type, machine_type):
+        return f"{accelerator_type}/{machine_type}"
+
+    @staticmethod
+    def is_in_regions(zone_name, regions):
+        return not regions or any(zone_name.startswith(f"{region}-") for region in regions)
+
+    def get_zones(self, compute, accelerator_type, machine_type, regions=None):
+        key = self.get_key(accelerator_type, machine_type)
+        entry = self.state_store.read().get(key)
+
+        if not entry or time.time() - entry["UPDATED_AT"] > self.ttl:
+            self.metrics.increment("zone_index_refreshes")
+            zones = self.fetch_zones(compute, accelerator_type, machine_type)
+            entry = {"ZONES": zones, "UPDATED_AT": time.time()}
+            if zones:
+                self.state_store.update(**{key: entry})
+
+        return [zone for zone in entry["ZONES"] if self.is_in_regions(zone, regions)]
+
+    def invalidate(self, accelerator_type, machine_type):
+        self.state_store.update(**{self.get_key(accelerator_type, machine_type): None})
+
+    def fetch_zones(self, compute, accelerator_type, machine_type):
+        self.service_logger.info(f"Refreshing zone capability index for '{accelerator_type}' and '{machine_type}'...")
+        machine_type_zones = self.get_zones_with_resource(compute.machineTypes(), "machineTypes", machine_type)
+        if not accelerator_type:
+            return sorted(machine_type_zones)
+        accelerator_zones = self.get_zones_with_resource(compute.acceleratorTypes(), "acceleratorTypes", accelerator_type)
+        return sorted(accelerator_zones & machine_type_zones)
+
+    def get_zones_with_resource(self, resource, items_key, resource_name):
+        zones = set()
+        request = resource.aggregatedList(project=self.project, filter=f'name = "{resource_name}"')
+        while request is not None:
+            with self.metrics.api_call(f"{items_key}.aggregatedList"):
+                response = request.execute()
+            for scope, scoped_list in response.get("items", {}).items():
+                if any(item["name"] == resource_name for item in scoped_list.get(items_key, [])):
+                    zones.add(scope.split("/")[-1])
+            request = resource.aggregatedList_next(previous_request=request, previous_response=response)
+        return zones
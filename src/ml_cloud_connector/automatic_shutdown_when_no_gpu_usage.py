@@ -1,39 +1,276 @@
+import argparse
+import ctypes
+import json
+import os
 import subprocess
+import threading
 import time
-import os
+import urllib.request
+
+GPU_MEMORY_CHANGE_THRESHOLD = int(os.getenv("GPU_MEMORY_CHANGE_THRESHOLD", "500"))
+GPU_UTILIZATION_THRESHOLD = int(os.getenv("GPU_UTILIZATION_THRESHOLD", "5"))
+SERVICE_PORTS = [
+    int(port) for port in os.getenv("SERVICE_PORTS", os.getenv("SERVICE_PORT", "11434")).split(",") if port.strip()
+]
+INACTIVITY_THRESHOLD = int(os.getenv("INACTIVITY_THRESHOLD", "300"))
+BUSY_SAMPLES_TO_WAKE = int(os.getenv("BUSY_SAMPLES_TO_WAKE", "1"))
+CHECK_INTERVAL = float(os.getenv("CHECK_INTERVAL", "5"))
+KEEPALIVE_CHECK_INTERVAL = float(os.getenv("KEEPALIVE_CHECK_INTERVAL", "30"))
+DECISIONS_LOG_PATH = os.getenv("IDLE_DECISIONS_LOG_PATH", "/tmp/idle_decisions.jsonl")
+KEEPALIVE_URL = "http://metadata.google.internal/computeMetadata/v1/instance/attributes/keepalive-until"
+
+TCP_ESTABLISHED = "01"
+TCP_TIME_WAIT = "06"
+
+
+class GpuSample:
+    def __init__(self, utilization: float, memory_used: float):
+        self.utilization = utilization
+        self.memory_used = memory_used
+
+
+class NvmlGpuSource:
+    def __init__(self):
+        self.nvml = ctypes.CDLL("libnvidia-ml.so.1")
+        if self.nvml.nvmlInit_v2() != 0:
+            raise OSError("NVML initialization failed")
+        count = ctypes.c_uint()
+        self.nvml.nvmlDeviceGetCount_v2(ctypes.byref(count))
+        self.handles = []
+        for index in range(count.value):
+            handle = ctypes.c_void_p()
+            self.nvml.nvmlDeviceGetHandleByIndex_v2(index, ctypes.byref(handle))
+            self.handles.append(handle)
+
+    def read(self):
+        utilization = 0
+        memory_used = 0
+        for handle in self.handles:
+            rates = (ctypes.c_uint * 2)()
+            memory = (ctypes.c_ulonglong * 3)()
+            self.nvml.nvmlDeviceGetUtilizationRates(handle, ctypes.byref(rates))
+            self.nvml.nvmlDeviceGetMemoryInfo(handle, ctypes.byref(memory))
+            utilization = max(utilization, rates[0])
+            memory_used += memory[2] / 1024 / 1024
+        return GpuSample(utilization, memory_used)
+
+    def close(self):
+        self.nvml.nvmlShutdown()
+
+
+class NvidiaSmiStreamSource:
+    def __init__(self, interval_ms: int = 500):
+        self.lock = threading.Lock()
+        self.peak_utilization = 0.0
+        self.memory_used = 0.0
+        self.process = subprocess.Popen(
+            [
+                "nvidia-smi",
+                "--query-gpu=utilization.gpu,memory.used",
+                "--format=csv,nounits,noheader",
+                f"--loop-ms={interval_ms}",
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.reader = threading.Thread(target=self.read_stream, daemon=True)
+        self.reader.start()
+
+    def read_stream(self):
+        for line in self.process.stdout:
+            try:
+                utilization, memory_used = [float(value) for value in line.split(",")]
+            except ValueError:
+                continue
+            with self.lock:
+                self.peak_utilization = max(self.peak_utilization, utilization)
+                self.memory_used = memory_used
+
+    def read(self):
+        with self.lock:
+            sample = GpuSample(self.peak_utilization, self.memory_used)
+            self.peak_utilization = 0.0
+        return sample
+
+    def close(self):
+        self.process.terminate()
+
+
+class FakeGpuSource:
+    def __init__(self, samples: list[tuple[float, float]]):
+        self.samples = samples
+        self.index = 0
+
+    def read(self):
+        utilization, memory_used = self.samples[min(self.index, len(self.samples) - 1)]
+        self.index += 1
+        return GpuSample(utilization, memory_used)
 
-GPU_MEMORY_THRESHOLD = 1000
-INACTIVITY_THRESHOLD = 300
-CHECK_INTERVAL = 60
+    def close(self):
+        pass
 
 
-def get_gpu_memory_usage():
+class NoGpuSource:
+    def read(self):
+        return None
+
+    def close(self):
+        pass
+
+
+def get_gpu_source():
     try:
-        output = subprocess.check_output(["nvidia-smi", "--query-gpu=memory.used", "--format=csv,nounits,noheader"])
+        return NvmlGpuSource()
+    except OSError:
+        pass
+    try:
+        return NvidiaSmiStreamSource()
     except FileNotFoundError:
-        return 0
-    return sum([int(memory) for memory in output.split()])
+        return NoGpuSource()
+
+
+def count_service_connections(ports: list[int] = SERVICE_PORTS, paths=("/proc/net/tcp", "/proc/net/tcp6")):
+    established = 0
+    recently_closed = 0
+    for path in paths:
+        try:
+            with open(path) as tcp_table:
+                next(tcp_table)
+                for line in tcp_table:
+                    fields = line.split()
+                    local_port = int(fields[1].split(":")[1], 16)
+                    if local_port not in ports:
+                        continue
+                    if fields[3] == TCP_ESTABLISHED:
+                        established += 1
+                    elif fields[3] == TCP_TIME_WAIT:
+                        recently_closed += 1
+        except FileNotFoundError:
+            continue
+    return established, recently_closed
+
+
+class KeepaliveLease:
+    def __init__(self, check_interval: float = KEEPALIVE_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.checked_at = 0.0
+        self.keepalive_until = 0.0
+
+    @staticmethod
+    def get_keepalive_until():
+        request = urllib.request.Request(KEEPALIVE_URL, headers={"Metadata-Flavor": "Google"})
+        try:
+            with urllib.request.urlopen(request, timeout=2) as response:
+                return float(response.read())
+        except (OSError, ValueError):
+            return 0
 
+    def is_active(self, now: float):
+        if now - self.checked_at >= self.check_interval:
+            self.keepalive_until = self.get_keepalive_until()
+            self.checked_at = now
+        return now < self.keepalive_until
 
-def is_gpu_in_use():
-    return get_gpu_memory_usage() >= GPU_MEMORY_THRESHOLD
 
+class IdleDetector:
+    def __init__(
+        self,
+        gpu_source,
+        connection_counter=count_service_connections,
+        keepalive_lease=None,
+        inactivity_threshold: float = INACTIVITY_THRESHOLD,
+        busy_samples_to_wake: int = BUSY_SAMPLES_TO_WAKE,
+    ):
+        self.gpu_source = gpu_source
+        self.connection_counter = connection_counter
+        self.keepalive_lease = keepalive_lease or KeepaliveLease()
+        self.inactivity_threshold = inactivity_threshold
+        self.busy_samples_to_wake = busy_samples_to_wake
+        self.state = "BUSY"
+        self.last_busy_time = None
+        self.busy_streak = 0
+        self.previous_memory_used = None
 
-def automatic_shutdown():
-    last_usage_time = time.time()
+    def get_busy_reasons(self, sample: GpuSample, connections: tuple[int, int], keepalive_active: bool):
+        reasons = []
+        if sample and sample.utilization >= GPU_UTILIZATION_THRESHOLD:
+            reasons.append(f"gpu utilization {sample.utilization:.0f}%")
+        if sample and self.previous_memory_used is not None:
+            if abs(sample.memory_used - self.previous_memory_used) >= GPU_MEMORY_CHANGE_THRESHOLD:
+                reasons.append(f"gpu memory changed to {sample.memory_used:.0f} MiB")
+        if connections[0]:
+            reasons.append(f"{connections[0]} active connections on ports {SERVICE_PORTS}")
+        if connections[1]:
+            reasons.append(f"{connections[1]} recently closed connections on ports {SERVICE_PORTS}")
+        if keepalive_active:
+            reasons.append("keepalive lease")
+        return reasons
 
-    while True:
-        if is_gpu_in_use():
-            last_usage_time = time.time()
+    def observe(self, now: float):
+        if self.last_busy_time is None:
+            self.last_busy_time = now
+
+        sample = self.gpu_source.read()
+        reasons = self.get_busy_reasons(sample, self.connection_counter(), self.keepalive_lease.is_active(now))
+        if sample:
+            self.previous_memory_used = sample.memory_used
+
+        previous_state = self.state
+        if reasons:
+            self.busy_streak += 1
+            if self.state == "BUSY" or self.busy_streak >= self.busy_samples_to_wake:
+                self.state = "BUSY"
+                self.last_busy_time = now
         else:
-            idle_time = int(time.time() - last_usage_time)
+            self.busy_streak = 0
+            self.state = "SHUTDOWN" if now - self.last_busy_time >= self.inactivity_threshold else "IDLE"
+
+        return {
+            "time": now,
+            "state": self.state,
+            "previous_state": previous_state,
+            "idle_seconds": round(now - self.last_busy_time, 1),
+            "reasons": reasons,
+            "gpu_utilization": sample.utilization if sample else None,
+            "gpu_memory_used": sample.memory_used if sample else None,
+        }
 
-            if idle_time > INACTIVITY_THRESHOLD:
-                print("Inactivity threshold reached. Shutting down...")
-                os.system("sudo shutdown now")
 
-        time.sleep(CHECK_INTERVAL)
+def report_decision(decision: dict, decisions_log_path: str = DECISIONS_LOG_PATH):
+    if decision["state"] == decision["previous_state"]:
+        return
+    reasons = ", ".join(decision["reasons"]) or f"idle for {decision['idle_seconds']} seconds"
+    print(f"{decision['previous_state']} -> {decision['state']}: {reasons}", flush=True)
+    if decisions_log_path:
+        with open(decisions_log_path, "a") as decisions_log:
+            decisions_log.write(json.dumps(decision) + "\n")
+
+
+def automatic_shutdown(detector: IdleDetector = None, dry_run: bool = False, clock=time.time, sleep=time.sleep):
+    detector = detector or IdleDetector(get_gpu_source())
+    try:
+        while True:
+            decision = detector.observe(clock())
+            report_decision(decision)
+            if decision["state"] == "SHUTDOWN":
+                print("Inactivity threshold reached. Shutting down...", flush=True)
+                if not dry_run:
+                    os.system("sudo shutdown now")
+                return decision
+            sleep(CHECK_INTERVAL)
+    finally:
+        detector.gpu_source.close()
+
+
+def get_fake_gpu_source(samples: str):
+    return FakeGpuSource([tuple(float(value) for value in sample.split(":")) for sample in samples.split(",")])
 
 
 if __name__ == "__main__":
-    automatic_shutdown()
+    parser = argparse.ArgumentParser(description="Shut the instance down once the GPU service is idle")
+    parser.add_argument("--dry-run", action="store_true", help="Report the shutdown decision without shutting down")
+    parser.add_argument("--fake-gpu", help="Comma separated utilization:memory samples, e.g. 80:9000,0:9000")
+    arguments = parser.parse_args()
+
+    gpu_source = get_fake_gpu_source(arguments.fake_gpu) if arguments.fake_gpu else get_gpu_source()
+    automatic_shutdown(IdleDetector(gpu_source), dry_run=arguments.dry_run)
@@ -0,0 +1,91 @@
+import json
+import threading
+
+from ml_cloud_connector.configuration import setup_credentials
+
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+HTTP_TIMEOUT = 180
+
+clients_lock = threading.RLock()
+thread_clients = threading.local()
+shared_clients = {}
+
+
+def get_shared_client(name, build_client):
+    client = shared_clients.get(name)
+    if client is not None:
+        return client
+
+    with clients_lock:
+        if name not in shared_clients:
+            shared_clients[name] = build_client()
+        return shared_clients[name]
+
+
+def load_credentials():
+    import google.auth
+
+    setup_credentials()
+    return google.auth.default(scopes=SCOPES)[0]
+
+
+def get_credentials():
+    return get_shared_client("credentials", load_credentials)
+
+
+def load_discovery_document():
+    from googleapiclient import discovery_cache
+
+    return json.loads(discovery_cache.get_static_doc("compute", "v1"))
+
+
+def get_discovery_document():
+    return get_shared_client("discovery_document", load_discovery_document)
+
+
+def build_compute():
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient import discovery
+
+    http = AuthorizedHttp(get_credentials(), http=httplib2.Http(timeout=HTTP_TIMEOUT))
+    return discovery.build_from_document(get_discovery_document(), http=http)
+
+
+def get_compute():
+    compute_factory = shared_clients.get("compute_factory", build_compute)
+    if getattr(thread_clients, "compute_factory", None) is not compute_factory:
+        thread_clients.compute = compute_factory()
+        thread_clients.compute_factory = compute_factory
+    return thread_clients.compute
+
+
+def build_instances_client():
+    from google.cloud import compute_v1
+
+    return compute_v1.InstancesClient(credentials=get_credentials())
+
+
+def build_disks_client():
+    from google.cloud import compute_v1
+
+    return compute_v1.DisksClient(credentials=get_credentials())
+
+
+def get_instances_client():
+    return get_shared_client("instances_client", build_instances_client)
+
+
+def get_disks_client():
+    return get_shared_client("disks_client", build_disks_client)
+
+
+def use_clients(compute_factory=None, instances_client=None, disks_client=None):
+    with clients_lock:
+        shared_clients.clear()
+        if compute_factory:
+            shared_clients["compute_factory"] = compute_factory
+        if instances_client:
+            shared_clients["instances_client"] = instances_client
+        if disks_client:
+            shared_clients["disks_client"] = disks_client
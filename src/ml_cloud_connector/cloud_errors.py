@@ -0,0 +1,23 @@
+from functools import cache
+
+
+@cache
+def get_request_retry_errors():
+    from httpx import ConnectError, ReadTimeout
+
+    return ConnectError, ReadTimeout
+
+
+@cache
+def get_reconnect_errors():
+    from httpx import ConnectTimeout, HTTPStatusError, RemoteProtocolError
+    from requests.exceptions import ConnectionError
+
+    return ConnectionError, ConnectTimeout, HTTPStatusError, RemoteProtocolError, KeyError
+
+
+@cache
+def get_not_found_error():
+    from google.api_core.exceptions import NotFound
+
+    return NotFound
@@ -1,25 +1,84 @@
 import json
 import os
+import threading
 from pathlib import Path
 
-from dotenv import load_dotenv
+ROOT_PATH = Path(os.path.abspath(__file__)).parent.parent.parent
 
-load_dotenv()
+settings = {}
+settings_lock = threading.Lock()
+
+
+def load_settings():
+    with settings_lock:
+        if settings:
+            return settings
+
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        settings.update(
+            {
+                "CREDENTIALS_PATH": os.environ.get("CREDENTIALS_PATH", ""),
+                "CREDENTIALS": os.environ.get("CREDENTIALS", ""),
+                "PROJECT_ID": os.getenv("PROJECT_ID", ""),
+                "SERVICE_PATH": os.getenv("SERVICE_PATH", ""),
+                "INSTANCE_STATE_TTL": float(os.getenv("INSTANCE_STATE_TTL", "60")),
+                "PROVISIONING_LEASE_SECONDS": float(os.getenv("PROVISIONING_LEASE_SECONDS", "1800")),
+                "POWER_LEASE_SECONDS": float(os.getenv("POWER_LEASE_SECONDS", "600")),
+                "READINESS_TIMEOUT": float(os.getenv("READINESS_TIMEOUT", "600")),
+                "ZONE_INDEX_TTL": float(os.getenv("ZONE_INDEX_TTL", "86400")),
+                "HEDGED_PROVISIONING_FAN_OUT": int(os.getenv("HEDGED_PROVISIONING_FAN_OUT", "1")),
+                "INSTANCE_RUNNING_TIMEOUT": float(os.getenv("INSTANCE_RUNNING_TIMEOUT", "600")),
+                "CIRCUIT_BREAKER_FAILURE_THRESHOLD": int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "3")),
+                "CIRCUIT_BREAKER_RESET_TIMEOUT": float(os.getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", "30")),
+                "KEEPALIVE_TRAFFIC_SECONDS": float(os.getenv("KEEPALIVE_TRAFFIC_SECONDS", "0")),
+                "PREWARM_SCHEDULE": os.getenv("PREWARM_SCHEDULE", ""),
+                "PREWARM_LEAD_SECONDS": float(os.getenv("PREWARM_LEAD_SECONDS", "180")),
+                "INSTANCE_WATCH_INTERVAL": float(os.getenv("INSTANCE_WATCH_INTERVAL", "15")),
+                "POOL_MIN_INSTANCES": int(os.getenv("POOL_MIN_INSTANCES", "1")),
+                "POOL_MAX_INSTANCES": int(os.getenv("POOL_MAX_INSTANCES", "1")),
+                "POOL_SCALE_OUT_IN_FLIGHT": float(os.getenv("POOL_SCALE_OUT_IN_FLIGHT", "4")),
+                "POOL_SCALE_OUT_LATENCY": float(os.getenv("POOL_SCALE_OUT_LATENCY", "0")),
+                "POOL_SCALE_IN_IDLE_SECONDS": float(os.getenv("POOL_SCALE_IN_IDLE_SECONDS", "900")),
+                "POOL_CHECK_INTERVAL": float(os.getenv("POOL_CHECK_INTERVAL", "10")),
+                "WARMUP_MODEL": os.getenv("WARMUP_MODEL", "aya:35b"),
+                "TRACE_PATH": os.getenv("TRACE_PATH", ""),
+                "STANDBY_DISKS_PER_ZONE": int(os.getenv("STANDBY_DISKS_PER_ZONE", "0")),
+                "STANDBY_DISK_CHECK_INTERVAL": float(os.getenv("STANDBY_DISK_CHECK_INTERVAL", "60")),
+                "STANDBY_DISK_CLAIM_GRACE_PERIOD": float(os.getenv("STANDBY_DISK_CLAIM_GRACE_PERIOD", "1800")),
+                "SERVICE_PORTS": [int(port) for port in os.getenv("SERVICE_PORTS", "11434").split(",") if port.strip()],
+                "TARGET_REGIONS": [
+                    region.strip() for region in os.getenv("TARGET_REGIONS", "europe-west4").split(",") if region.strip()
+                ],
+            }
+        )
+        return settings
+
+
+def __getattr__(name):
+    if name.isupper() and name in load_settings():
+        return settings[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+credentials_ready = threading.Event()
 
-ROOT_PATH = Path(os.path.abspath(__file__)).parent.parent.parent
 
-CREDENTIALS_PATH = os.environ.get("CREDENTIALS_PATH", "")
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = CREDENTIALS_PATH
-CREDENTIALS = os.environ.get("CREDENTIALS", "")
-PROJECT_ID = os.getenv("PROJECT_ID", "")
-SERVICE_PATH = os.getenv("SERVICE_PATH", "")
+def setup_credentials():
+    with settings_lock:
+        if credentials_ready.is_set():
+            return
+        credentials_ready.set()
 
-if not os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "") and CREDENTIALS:
-    google_application_credentials_path = Path("/", "tmp", "credentials.json")
-    if type(CREDENTIALS) == str and '"' == CREDENTIALS.strip()[0] and '"' == CREDENTIALS.strip()[-1]:
-        CREDENTIALS = json.dumps(json.loads(CREDENTIALS.strip()[1:-1]))
-    google_application_credentials_path.write_text(CREDENTIALS)
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(google_application_credentials_path)
+    credentials = load_settings()["CREDENTIALS"]
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = settings["CREDENTIALS_PATH"]
+    if not os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "") and credentials:
+        google_application_credentials_path = Path("/", "tmp", "credentials.json")
+        if type(credentials) == str and '"' == credentials.strip()[0] and '"' == credentials.strip()[-1]:
+            credentials = json.dumps(json.loads(credentials.strip()[1:-1]))
+        google_application_credentials_path.write_text(credentials)
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(google_application_credentials_path)
 
 
 GOOGLE_CLOUD_INSTANCE_CONFIGURATION = {
@@ -31,7 +90,7 @@ GOOGLE_CLOUD_INSTANCE_CONFIGURATION = {
         }
     ],
     "tags": {"items": ["http-server", "https-server", "ollama-server"], "fingerprint": "n79AIbZ_p0c="},
-    "metadata": {},
+    "metadata": {"items": [{"key": "enable-guest-attributes", "value": "TRUE"}]},
     "serviceAccounts": [
         {
             "email": "610489196507-compute@developer.gserviceaccount.com",
@@ -2,23 +2,91 @@ import os
 from os.path import join
 from pathlib import Path
 from crontab import CronTab
-from configuration import ROOT_PATH, SERVICE_PATH
+from configuration import ROOT_PATH, SERVICE_PATH, SERVICE_PORTS, WARMUP_MODEL
+
+REPOSITORY_PATH = "/home/debian/ml-cloud-connector"
+WHEEL_CACHE_PATH = "$HOME/.cache/ml-cloud-connector/wheels"
+REQUIREMENTS_HASH_PATH = "$HOME/.cache/ml-cloud-connector/requirements.sha256"
+BOOT_TIMINGS_PATH = "/tmp/boot-timings"
+BOOT_TIMINGS_NAMESPACE = "boot-timings"
+GUEST_ATTRIBUTES_URL = "http://metadata.google.internal/computeMetadata/v1/instance/guest-attributes"
+SERVICE_URL = f"http://localhost:{SERVICE_PORTS[0]}"
+
+
+def get_timing_function():
+    return (
+        f"mkdir -p {BOOT_TIMINGS_PATH}\n"
+        "record_timing() {\n"
+        f'    echo "$2 $3" > "{BOOT_TIMINGS_PATH}/$1"\n'
+        f'    curl -s -X PUT --data "$2" -H "Metadata-Flavor: Google" '
+        f'"{GUEST_ATTRIBUTES_URL}/{BOOT_TIMINGS_NAMESPACE}/$1" > /dev/null\n'
+        "}\n"
+        "timed() {\n"
+        "    local name=$1; shift\n"
+        "    local start=$(date +%s%3N)\n"
+        '    "$@"\n'
+        "    local status=$?\n"
+        '    record_timing "$name" "$(( $(date +%s%3N) - start ))" "$status"\n'
+        "    return $status\n"
+        "}\n"
+    )
+
+
+def get_install_requirements_function():
+    requirements_path = join(ROOT_PATH, "requirements.txt")
+    return (
+        "install_requirements() {\n"
+        f"    local requirements_hash=$(sha256sum {requirements_path} | cut -d ' ' -f 1)\n"
+        f'    if [ "$requirements_hash" = "$(cat {REQUIREMENTS_HASH_PATH} 2>/dev/null)" ]; then\n'
+        "        return 0\n"
+        "    fi\n"
+        f"    mkdir -p {WHEEL_CACHE_PATH}\n"
+        f"    pip install --find-links {WHEEL_CACHE_PATH} -r {requirements_path} || return 1\n"
+        f"    pip wheel -q --wheel-dir {WHEEL_CACHE_PATH} -r {requirements_path}\n"
+        f'    echo "$requirements_hash" > {REQUIREMENTS_HASH_PATH}\n'
+        "}\n"
+    )
+
+
+def get_warm_up_model_function():
+    if not WARMUP_MODEL:
+        return "warm_up_model() {\n    return 0\n}\n"
+
+    return (
+        "warm_up_model() {\n"
+        "    for attempt in $(seq 600); do\n"
+        f"        curl -sf {SERVICE_URL}/ > /dev/null && break\n"
+        "        sleep 0.5\n"
+        "    done\n"
+        f'    curl -sf {SERVICE_URL}/api/generate -d \'{{"model": "{WARMUP_MODEL}", "keep_alive": "30m"}}\' > /dev/null\n'
+        "}\n"
+    )
 
 
 def get_post_start_script():
+    automatic_shutdown_script_path = join(ROOT_PATH, "src", "ml_cloud_connector", "automatic_shutdown_when_no_gpu_usage.py")
+
     post_installation_script = f"#!/bin/bash\n"
+    post_installation_script += "boot_start=$(date +%s%3N)\n"
     post_installation_script += "sudo shutdown +1440\n"
-    post_installation_script += "sudo iptables -A INPUT -p tcp --dport 11434 -j ACCEPT\n"
-    with open(join(ROOT_PATH, "requirements.txt")) as f:
-        requirements = f.read().splitlines()
-
-        for requirement in requirements:
-            post_installation_script += f"pip install {requirement}\n"
+    for service_port in SERVICE_PORTS:
+        post_installation_script += f"sudo iptables -A INPUT -p tcp --dport {service_port} -j ACCEPT\n"
+    post_installation_script += get_timing_function()
+    post_installation_script += get_install_requirements_function()
+    post_installation_script += get_warm_up_model_function()
+    post_installation_script += f"update_code() {{\n    cd {REPOSITORY_PATH} && git pull\n}}\n"
+    post_installation_script += f"start_service() {{\n    cd {SERVICE_PATH} && make start_detached\n}}\n"
 
-    post_installation_script += f"cd /home/debian/ml-cloud-connector ; git pull\n"
-    automatic_shutdown_script_path = join(ROOT_PATH, "src", "ml_cloud_connector", "automatic_shutdown_when_no_gpu_usage.py")
-    post_installation_script += f"nohup python3 {automatic_shutdown_script_path} &\n"
-    post_installation_script += f"cd {SERVICE_PATH} ; make start_detached\n"
+    post_installation_script += "(timed start_service start_service; timed warm_up_model warm_up_model) &\n"
+    post_installation_script += "(\n"
+    post_installation_script += "    timed update_code update_code\n"
+    service_ports = ",".join(str(service_port) for service_port in SERVICE_PORTS)
+    post_installation_script += f"    SERVICE_PORTS={service_ports} nohup python3 {automatic_shutdown_script_path}"
+    post_installation_script += " > /tmp/automatic_shutdown.log 2>&1 &\n"
+    post_installation_script += "    timed install_requirements install_requirements\n"
+    post_installation_script += ") &\n"
+    post_installation_script += "wait\n"
+    post_installation_script += 'record_timing total "$(( $(date +%s%3N) - boot_start ))" 0\n'
     return post_installation_script
 
 
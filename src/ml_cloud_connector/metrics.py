@@ -0,0 +1,41 @@
+import time
+
+from ml_cloud_connector.Deadline import get_current_deadline
+from ml_cloud_connector.MetricsHook import MetricsHook
+from ml_cloud_connector.tracing import span
+
+metrics_hook = {"default": MetricsHook()}
+
+
+def get_metrics() -> MetricsHook:
+    return metrics_hook["default"]
+
+
+def set_metrics(hook: MetricsHook):
+    metrics_hook["default"] = hook
+
+
+def sleep(seconds: float, reason: str, metrics: MetricsHook = None):
+    deadline = get_current_deadline()
+    if deadline:
+        deadline.check(seconds)
+    (metrics or get_metrics()).record_sleep(reason, seconds)
+    with span(reason, kind="sleep", seconds=seconds):
+        if deadline:
+            deadline.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+
+async def async_sleep(seconds: float, reason: str, metrics: MetricsHook = None):
+    import asyncio
+
+    deadline = get_current_deadline()
+    if deadline:
+        deadline.check(seconds)
+    (metrics or get_metrics()).record_sleep(reason, seconds)
+    with span(reason, kind="sleep", seconds=seconds):
+        if deadline:
+            await deadline.async_sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
@@ -0,0 +1,38 @@
+from ml_cloud_connector.MachineConfiguration import MachineConfiguration
+from ml_cloud_connector.ServerProfile import ServerProfile
+from ml_cloud_connector.ServerType import ServerType
+
+SERVER_PROFILES = {
+    ServerType.TRANSLATION: ServerProfile(
+        snapshot_name="translation-server-snapshot",
+        machine_configurations=[MachineConfiguration("g2-standard-4", "nvidia-l4", 1)],
+        service_port=11434,
+        readiness_path="/",
+    ),
+}
+
+
+def register_server_profile(server_type: ServerType, server_profile: ServerProfile):
+    SERVER_PROFILES[server_type] = server_profile
+
+
+def get_server_profile(server_type: ServerType) -> ServerProfile:
+    if server_type not in SERVER_PROFILES:
+        raise ValueError(f"No server profile registered for {server_type.value}")
+    return SERVER_PROFILES[server_type]
+
+
+def get_host_server_type(server_type: ServerType) -> ServerType:
+    visited = [server_type]
+    while server_type in SERVER_PROFILES and SERVER_PROFILES[server_type].shares_instance_with:
+        server_type = SERVER_PROFILES[server_type].shares_instance_with
+        if server_type in visited:
+            raise ValueError(
+                f"Server profiles share instances in a cycle: {[visited_type.value for visited_type in visited]}"
+            )
+        visited.append(server_type)
+    return server_type
+
+
+def get_hosted_server_types(host_server_type: ServerType) -> list[ServerType]:
+    return [server_type for server_type in SERVER_PROFILES if get_host_server_type(server_type) == host_server_type]
@@ -0,0 +1,110 @@
+import json
+import math
+from collections import defaultdict
+from pathlib import Path
+
+TIMELINE_WIDTH = 40
+
+
+def read_spans(trace_path: Path):
+    spans = []
+    with open(trace_path) as trace_file:
+        for line in trace_file:
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return spans
+
+
+def group_traces(spans):
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+    return sorted(traces.values(), key=lambda trace: min(span["start"] for span in trace))
+
+
+def get_phase_name(span):
+    return span["name"] if span["kind"] in ("phase", "request") else f"{span['kind']}:{span['name']}"
+
+
+def get_ordered_spans(trace):
+    span_ids = {span["span_id"] for span in trace}
+    children = defaultdict(list)
+    for span in trace:
+        children[span["parent_id"] if span["parent_id"] in span_ids else None].append(span)
+
+    def visit(parent_id, depth):
+        for span in sorted(children[parent_id], key=lambda child: child["start"]):
+            yield span, depth
+            yield from visit(span["span_id"], depth + 1)
+
+    return list(visit(None, 0))
+
+
+def render_timeline(trace, width=TIMELINE_WIDTH):
+    trace_start = min(span["start"] for span in trace)
+    trace_seconds = max(max(span["start"] + span["duration"] for span in trace) - trace_start, 1e-9)
+    lines = [f"trace {trace[0]['trace_id']} {trace_seconds:.1f} s"]
+    for span, depth in get_ordered_spans(trace):
+        offset = span["start"] - trace_start
+        bar_start = int(offset / trace_seconds * width)
+        bar_length = max(int(span["duration"] / trace_seconds * width), 1)
+        bar = " " * bar_start + "#" * min(bar_length, width - bar_start)
+        status = "" if span["status"] == "ok" else f" [{span['status']}]"
+        attributes = " ".join(f"{key}={value}" for key, value in span["attributes"].items() if key != "seconds")
+        name = f"{'  ' * depth}{get_phase_name(span)} {attributes}".rstrip() + status
+        lines.append(f"{offset:>8.1f}{span['duration']:>8.1f}  |{bar:<{width}}|  {name}")
+    return "\n".join(lines)
+
+
+def render_report(trace_path: Path, trace_id=None, last=1):
+    traces = group_traces(read_spans(trace_path))
+    if trace_id:
+        traces = [trace for trace in traces if trace[0]["trace_id"].startswith(trace_id)]
+    elif last:
+        traces = traces[-last:]
+    header = f"{'start s':>8}{'took s':>8}  |{'timeline':<{TIMELINE_WIDTH}}|  phase"
+    return "\n\n".join(f"{header}\n{render_timeline(trace)}" for trace in traces) or "No traces found"
+
+
+def get_percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percentile / 100 * len(ordered)) - 1, 0)]
+
+
+def get_phase_durations(traces):
+    phase_durations = defaultdict(list)
+    for trace in traces:
+        trace_durations = defaultdict(float)
+        for span in trace:
+            trace_durations[get_phase_name(span)] += span["duration"]
+        for phase_name, duration in trace_durations.items():
+            phase_durations[phase_name].append(duration)
+    return phase_durations
+
+
+def render_comparison(trace_paths: list[Path]):
+    runs = [group_traces(read_spans(trace_path)) for trace_path in trace_paths]
+    phase_durations = [get_phase_durations(traces) for traces in runs]
+    phase_names = sorted(
+        {phase_name for durations in phase_durations for phase_name in durations},
+        key=lambda phase_name: -max(
+            get_percentile(durations[phase_name], 50) for durations in phase_durations if phase_name in durations
+        ),
+    )
+
+    header = f"{'phase':<40}"
+    for trace_path, traces in zip(trace_paths, runs):
+        header += f"{f'{trace_path.name} ({len(traces)} traces)'[:36]:>38}"
+    lines = [header, f"{'':<40}" + f"{'p50 s':>14}{'p95 s':>12}{'count':>12}" * len(runs)]
+    for phase_name in phase_names:
+        line = f"{phase_name[:39]:<40}"
+        for durations in phase_durations:
+            values = durations.get(phase_name)
+            if not values:
+                line += f"{'-':>14}{'-':>12}{0:>12}"
+                continue
+            line += f"{get_percentile(values, 50):>14.1f}{get_percentile(values, 95):>12.1f}{len(values):>12}"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,70 @@
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from ml_cloud_connector.JsonlSpanWriter import JsonlSpanWriter
+
+current_span: ContextVar[dict] = ContextVar("current_span", default=None)
+
+span_writers = {}
+
+
+def get_span_writer() -> JsonlSpanWriter:
+    if "default" not in span_writers:
+        from ml_cloud_connector import configuration
+
+        span_writers["default"] = JsonlSpanWriter(configuration.TRACE_PATH) if configuration.TRACE_PATH else None
+    return span_writers["default"]
+
+
+def set_span_writer(span_writer: JsonlSpanWriter):
+    span_writers["default"] = span_writer
+
+
+def new_span(span_writer: JsonlSpanWriter, name: str, kind: str, attributes: dict, start: float):
+    parent = current_span.get()
+    return {
+        "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex,
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent["span_id"] if parent else None,
+        "name": name,
+        "kind": kind,
+        "start": start,
+        "duration": 0.0,
+        "status": "ok",
+        "attributes": attributes,
+    }
+
+
+@contextmanager
+def span(name: str, kind: str = "phase", **attributes):
+    span_writer = get_span_writer()
+    if not span_writer:
+        yield None
+        return
+
+    traced_span = new_span(span_writer, name, kind, attributes, span_writer.clock())
+    token = current_span.set(traced_span)
+    try:
+        yield traced_span
+    except BaseException as error:
+        traced_span["status"] = type(error).__name__
+        raise
+    finally:
+        current_span.reset(token)
+        traced_span["duration"] = span_writer.clock() - traced_span["start"]
+        span_writer.write(traced_span)
+
+
+def set_span_status(traced_span: dict, status: str):
+    if traced_span:
+        traced_span["status"] = status
+
+
+def record_span(name: str, duration: float, kind: str = "phase", **attributes):
+    span_writer = get_span_writer()
+    if not span_writer:
+        return
+    traced_span = new_span(span_writer, name, kind, attributes, span_writer.clock() - duration)
+    traced_span["duration"] = duration
+    span_writer.write(traced_span)
@@ -1,38 +1,134 @@
-import time
+import asyncio
+import socket
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from google.api_core.exceptions import GoogleAPICallError
+from googleapiclient.errors import HttpError
 
+from ml_cloud_connector.cloud_clients import get_compute
+from ml_cloud_connector.metrics import get_metrics, sleep, async_sleep
+
+FIRST_POLL_INTERVAL = 0.5
+MAX_POLL_INTERVAL = 5
+LONG_POLL_TIMEOUT_ERRORS = (TimeoutError, socket.timeout)
 
-def wait_for_operation(project, compute, operation, service_logger):
-    service_logger.info("Waiting for operation to finish...")
-    operation_name = operation["name"]
 
+def get_operations_resource(compute, operation):
     if "zone" in operation:
-        operation_scope = "zone"
-        scope_name = operation["zone"].split("/")[-1]
-    elif "region" in operation:
-        operation_scope = "region"
-        scope_name = operation["region"].split("/")[-1]
-    else:
-        operation_scope = "global"
-        scope_name = None
+        return compute.zoneOperations(), {"zone": operation["zone"].split("/")[-1]}
+    if "region" in operation:
+        return compute.regionOperations(), {"region": operation["region"].split("/")[-1]}
+    return compute.globalOperations(), {}
+
+
+def get_operation(project, compute, operation, metrics=None):
+    resource, scope = get_operations_resource(compute, operation)
+    with (metrics or get_metrics()).api_call("operations.get"):
+        return resource.get(project=project, operation=operation["name"], **scope).execute()
+
+
+def long_poll_operation(project, compute, operation, metrics=None):
+    resource, scope = get_operations_resource(compute, operation)
+    with (metrics or get_metrics()).api_call("operations.wait"):
+        return resource.wait(project=project, operation=operation["name"], **scope).execute()
+
+
+def is_operation_done(result, service_logger):
+    if "error" in result:
+        if result["error"]["errors"][0]["code"] == "ZONE_RESOURCE_POOL_EXHAUSTED_WITH_DETAILS":
+            raise GoogleAPICallError(result["error"])
+        raise Exception(result["error"])
+
+    if result["status"] == "DONE":
+        service_logger.info("Operation completed.")
+        return True
+    return False
+
+
+def get_next_poll_interval(poll_interval):
+    return min(poll_interval * 1.5, MAX_POLL_INTERVAL)
+
+
+def wait_for_operation(project, compute, operation, service_logger, metrics=None):
+    metrics = metrics or get_metrics()
+    with metrics.timed("wait_for_operation"):
+        return poll_operation(project, compute, operation, service_logger, metrics)
+
+
+def poll_operation(project, compute, operation, service_logger, metrics):
+    service_logger.info("Waiting for operation to finish...")
+    use_long_poll = True
+    poll_interval = FIRST_POLL_INTERVAL
+
+    while True:
+        if use_long_poll:
+            try:
+                result = long_poll_operation(project, compute, operation, metrics)
+            except LONG_POLL_TIMEOUT_ERRORS:
+                continue
+            except HttpError as e:
+                service_logger.info(f"Operation long-poll not available, polling instead: {e}")
+                use_long_poll = False
+                continue
+        else:
+            result = get_operation(project, compute, operation, metrics)
+
+        if is_operation_done(result, service_logger):
+            return result
+
+        if not use_long_poll:
+            sleep(poll_interval, "operation_poll", metrics)
+            poll_interval = get_next_poll_interval(poll_interval)
+
+
+def wait_for_operations(project, operations, service_logger, compute_factory=None, max_workers=8, metrics=None):
+    compute_factory = compute_factory or get_compute
+
+    def wait_with_own_client(operation):
+        return wait_for_operation(project, compute_factory(), operation, service_logger, metrics)
+
+    if not operations:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(operations))) as executor:
+        futures = {executor.submit(wait_with_own_client, operation): operation for operation in operations}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+async def async_wait_for_operation(project, operation, service_logger, metrics=None, compute_factory=None):
+    metrics = metrics or get_metrics()
+    with metrics.timed("wait_for_operation"):
+        return await async_poll_operation(project, operation, service_logger, metrics, compute_factory or get_compute)
+
+
+async def async_poll_operation(project, operation, service_logger, metrics, compute_factory):
+    def call_with_own_client(function):
+        return function(project, compute_factory(), operation, metrics)
+
+    service_logger.info("Waiting for operation to finish...")
+    use_long_poll = True
+    poll_interval = FIRST_POLL_INTERVAL
 
     while True:
-        if operation_scope == "zone":
-            result = compute.zoneOperations().get(project=project, zone=scope_name, operation=operation_name).execute()
-        elif operation_scope == "region":
-            result = compute.regionOperations().get(project=project, region=scope_name, operation=operation_name).execute()
+        if use_long_poll:
+            try:
+                result = await asyncio.to_thread(call_with_own_client, long_poll_operation)
+            except LONG_POLL_TIMEOUT_ERRORS:
+                continue
+            except HttpError as e:
+                service_logger.info(f"Operation long-poll not available, polling instead: {e}")
+                use_long_poll = False
+                continue
         else:
-            result = compute.globalOperations().get(project=project, operation=operation_name).execute()
-
-        if "error" in result:
-            if result["error"]["errors"][0]["code"] == "ZONE_RESOURCE_POOL_EXHAUSTED_WITH_DETAILS":
-                raise GoogleAPICallError(result["error"])
-            raise Exception(result["error"])
-
-        if result["status"] == "DONE":
-            service_logger.info("Operation completed.")
-            if "error" in result:
-                service_logger.info("Error in operation:", result["error"])
-            break
-        time.sleep(5)
+            result = await asyncio.to_thread(call_with_own_client, get_operation)
+
+        if is_operation_done(result, service_logger):
+            return result
+
+        if not use_long_poll:
+            await async_sleep(poll_interval, "operation_poll", metrics)
+            poll_interval = get_next_poll_interval(poll_interval)
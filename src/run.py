@@ -1,13 +1,20 @@
+import argparse
+from pathlib import Path
 from time import time
 
 from ml_cloud_connector.MlCloudConnector import MlCloudConnector
 from ml_cloud_connector.ServerType import ServerType
 
 
-def run():
+def run(server_type: ServerType = ServerType.TRANSLATION, trace_path: Path = None):
+    if trace_path:
+        from ml_cloud_connector.JsonlSpanWriter import JsonlSpanWriter
+        from ml_cloud_connector.tracing import set_span_writer
 
-    MlCloudConnector.forget_cloud_instance(ServerType.TRANSLATION)
-    ml_cloud_connector = MlCloudConnector(ServerType.TRANSLATION)
+        set_span_writer(JsonlSpanWriter(trace_path))
+
+    MlCloudConnector.forget_cloud_instance(server_type)
+    ml_cloud_connector = MlCloudConnector(server_type)
     start = time()
     print("start")
     ml_cloud_connector.is_active()
@@ -17,5 +24,38 @@ def run():
     print("time", round(time() - start, 2), "s")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Start a cloud server and inspect cold-start traces")
+    subparsers = parser.add_subparsers(dest="command")
+
+    get_ip_parser = subparsers.add_parser("get-ip", help="Forget the cached instance and time get_ip")
+    get_ip_parser.add_argument(
+        "--server-type", choices=[server_type.value for server_type in ServerType], default="translation"
+    )
+    get_ip_parser.add_argument("--trace", type=Path, help="Append the spans of this run to a JSONL trace file")
+
+    report_parser = subparsers.add_parser("report", help="Render per-phase timelines from a JSONL trace file")
+    report_parser.add_argument("trace_path", type=Path)
+    report_parser.add_argument("--trace-id", help="Only render traces whose id starts with this prefix")
+    report_parser.add_argument("--last", type=int, default=1, help="Render the last N traces, 0 for all")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare phase percentiles across JSONL trace files")
+    compare_parser.add_argument("trace_paths", type=Path, nargs="+")
+
+    arguments = parser.parse_args()
+    if arguments.command == "report":
+        from ml_cloud_connector.trace_report import render_report
+
+        print(render_report(arguments.trace_path, arguments.trace_id, arguments.last))
+    elif arguments.command == "compare":
+        from ml_cloud_connector.trace_report import render_comparison
+
+        print(render_comparison(arguments.trace_paths))
+    elif arguments.command == "get-ip":
+        run(ServerType(arguments.server_type), arguments.trace)
+    else:
+        run()
+
+
 if __name__ == "__main__":
-    run()
+    main()